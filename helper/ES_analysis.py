@@ -1,16 +1,25 @@
 # Copyright (c) 2024 Jacopo Ventura
 
+import contextlib
 import datetime
+import functools
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
+from html import escape
 
 import numpy as np
 import os
 import pandas as pd
 # import pandas_datareader.data as web
-import plotly.graph_objects as go
 import sys
+from typing import TYPE_CHECKING
 # import plotly.express as px
 # from scipy.stats import t
 
+if TYPE_CHECKING:
+    # plotly is slow to import and only needed to plot: import it lazily in the plot methods
+    import plotly.graph_objects as go
+
 
 class EsPriceAnalysis:
     """
@@ -27,11 +36,21 @@ class EsPriceAnalysis:
         self.__KEY_NO_PERFECT_REBOUND = "No perfect rebound"  # Rebound after more than 2pt after cross or no rebound
         self.__KEY_TREND = "Trend since 8:30"
         self.__KEY_ES_PP = "ES & PP"
+        # columns of the journal used by the analysis: the other columns are not loaded
+        self.__COLUMNS_ANALYSIS = ["Date", self.__KEY_FIRST_REBOUND, self.__KEY_SECOND_REBOUND, self.__KEY_PT_DEEP_REBOUND,
+                                   self.__KEY_NO_PERFECT_REBOUND, self.__KEY_TREND, self.__KEY_ES_PP, "Hour trend change",
+                                   "New trend", "Max Range 8:30 - 13", "Time cross", "Body candle"]
 
         self.__ES_DATA_FILENAME = es_data_filename
         self.__FOLDER = folder
 
         self.__PATH_FINAL_REPORT = self.__FOLDER + '/ES_stats.html'
+        self.__PATH_DATA = os.path.expanduser(self.__FOLDER + self.__ES_DATA_FILENAME)
+        # parsed excel sheet, reused while the workbook is unchanged. It is unpickled at load, so it is kept in the user's own cache
+        # directory (one file per workbook path) and never in the data folder, which may be shared or synced
+        self.__FOLDER_CACHE = os.path.join(os.environ.get("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "trading_journal_analysis")
+        self.__PATH_DATA_CACHE = os.path.join(self.__FOLDER_CACHE,
+                                              hashlib.sha1(os.path.abspath(self.__PATH_DATA).encode()).hexdigest() + '.pkl')
 
         self.__FACTOR_ROUND = 10
         self.__BIN_RANGE_CPF = 5
@@ -51,6 +70,8 @@ class EsPriceAnalysis:
             datetime.time(hour=14, minute=30),
             datetime.time(hour=15, minute=00)
         ]
+        self.__x_cpf_time_seconds = np.array([self.__seconds_of_day(x) for x in self.__x_cpf_time])
+        self.__labels_cpf_time = ["% " + x.strftime('%H:%M') for x in self.__x_cpf_time]  # column names of the time CPF tables
 
         # dictionary for trend change analysis
         self.__stats_reversal = {"General": {},
@@ -113,28 +134,33 @@ class EsPriceAnalysis:
 
         self.__es_price_df = []
         self.__num_days = 0
-        self.__es_uptrend_df = []
+        # boolean masks of the rows of each trend and of its reversals: the rows are selected only when needed
+        self.__mask_uptrend = []
         self.__num_days_uptrend = 0
-        self.__es_downtrend_df = []
+        self.__mask_downtrend = []
         self.__num_days_downtrend = 0
-        self.__es_range_df = []
+        self.__mask_range = []
         self.__num_days_range = 0
-        self.__es_uptrend_then_reversal_df = []
-        self.__es_downtrend_then_reversal_df = []
-        self.__es_range_then_reversal_df = []
+        self.__mask_uptrend_then_reversal = []
+        self.__count_uptrend_then_reversal = 0
+        self.__mask_downtrend_then_reversal = []
+        self.__count_downtrend_then_reversal = 0
+        self.__mask_range_then_reversal = []
+        self.__count_range_then_reversal = 0
 
         self.__pct_uptrend_then_reversal = 0
         self.__pct_downtrend_then_reversal = 0
         self.__pct_range_then_reversal = 0
-        self.__es_price_with_reversal_df = []
 
-        self.__es_higher_pp_start = []
+        self.__mask_es_higher_pp_start = []
         self.__num_days_es_higher_pp_start = 0
-        self.__es_lower_pp_start = []
+        self.__mask_es_lower_pp_start = []
         self.__num_days_es_lower_pp_start = 0
 
-        self.__es_higher_pp_start_then_reversal_df = []
-        self.__es_lower_pp_start_then_reversal_df = []
+        self.__mask_es_higher_pp_start_then_reversal = []
+        self.__count_es_higher_pp_start_then_reversal = 0
+        self.__mask_es_lower_pp_start_then_reversal = []
+        self.__count_es_lower_pp_start_then_reversal = 0
 
         self.__pct_es_higher_pp_start_then_reversal = 0
         self.__pct_es_lower_pp_start_then_reversal = 0
@@ -147,13 +173,14 @@ class EsPriceAnalysis:
         # Step 1: get historical price data for the selected time period and check data quality
         self.query_data()
 
-        self.__analyze_reversal()
-
-        self.__analyze_pivot_points()
-
-        self.__analyze_range()
-
-        self.__analyze_no_rebound()
+        # Step 2: the analyses only read the price data and each one writes its own statistics, so they run concurrently.
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            futures = [executor.submit(self.__analyze_reversal),
+                       executor.submit(self.__analyze_range),
+                       executor.submit(self.__analyze_pivot_points),
+                       executor.submit(self.__analyze_no_rebound)]
+            for future in futures:
+                future.result()  # re-raise any exception of the analysis
 
         # Step 4: make html report
         self.__write_html()
@@ -165,20 +192,51 @@ class EsPriceAnalysis:
         """
 
         try:
-            self.__es_price_df = pd.read_excel(self.__FOLDER + self.__ES_DATA_FILENAME, sheet_name='ES movement')
+            # parsing the excel file is the slowest step of the analysis: reload the cached sheet if it is up-to-date
+            es_price_df = None
+            if os.path.exists(self.__PATH_DATA_CACHE) and os.path.getmtime(self.__PATH_DATA_CACHE) >= os.path.getmtime(self.__PATH_DATA):
+                try:
+                    es_price_df = pd.read_pickle(self.__PATH_DATA_CACHE)
+                except Exception as e:
+                    # e.g. a cache written by another pandas version: read the excel file again, which also rewrites the cache
+                    print('Cannot read the cached journal data:', e)
+            if not isinstance(es_price_df, pd.DataFrame) or not set(self.__COLUMNS_ANALYSIS).issubset(es_price_df.columns):
+                es_price_df = pd.read_excel(self.__PATH_DATA, sheet_name='ES movement', usecols=self.__COLUMNS_ANALYSIS)
+                path_data_cache_tmp = self.__PATH_DATA_CACHE + '.' + str(os.getpid()) + '.tmp'
+                try:
+                    # the cache is only an optimization: a folder that cannot be written must not stop the analysis.
+                    # The pickle is written aside and then moved into place, so an interrupted run cannot leave a truncated cache
+                    os.makedirs(self.__FOLDER_CACHE, exist_ok=True)
+                    es_price_df.to_pickle(path_data_cache_tmp)
+                    os.replace(path_data_cache_tmp, self.__PATH_DATA_CACHE)
+                except OSError as e:
+                    print('Cannot cache the journal data:', e)
+                    with contextlib.suppress(OSError):
+                        os.remove(path_data_cache_tmp)
+            # the Demark point columns only hold "PP", "S" and "R": as categories, equality tests compare integer codes.
+            # trend (-1/0/1) and ES & PP (-1/0/1/2) are small integers: int8 is enough, unless a day is left blank (NaN)
+            columns_dtype = {key: "category" for key in (self.__KEY_FIRST_REBOUND, self.__KEY_SECOND_REBOUND, self.__KEY_NO_PERFECT_REBOUND)}
+            columns_dtype.update({key: np.int8 for key in (self.__KEY_TREND, self.__KEY_ES_PP) if es_price_df[key].notna().all()})
+            self.__es_price_df = es_price_df[self.__COLUMNS_ANALYSIS].astype(columns_dtype)
+            # the times of the day are only binned for the time CPFs: convert them once into seconds since midnight
+            for key in ("Hour trend change", "Time cross"):
+                self.__es_price_df[key] = self.__es_price_df[key].map(self.__seconds_of_day, na_action="ignore").astype(np.float64)
             self.__num_days = len(self.__es_price_df.index)
+            # every analysis selects the days by trend and by ES & PP at 8:30am: the masks are computed once and only read afterwards
+            trend = self.__es_price_df[self.__KEY_TREND].to_numpy()
+            self.__mask_uptrend = trend == 1
+            self.__mask_downtrend = trend == -1
+            self.__mask_range = trend == 0
+            self.__mask_es_higher_pp_start, self.__mask_es_lower_pp_start = self.__es_pp_masks(self.__es_price_df[self.__KEY_ES_PP].to_numpy())
         except Exception as e:
             print('Cannot query historical data:', e)
             sys.exit(1)  # stop the main function with exit code 1
 
-    def __count_point(self, point: int, list_perfect_rebound: list, list_deep_rebound: list, list_no_rebound: list) -> tuple[list, list, list]:
+    def __round(self, x: float | np.ndarray) -> float | np.ndarray:
         """
-        Count occurrences of the point.
+        Truncate a value or an array of values to the decimals of the report.
         """
-        return list_perfect_rebound.count(point), list_deep_rebound.count(point), list_no_rebound.count(point)
-
-    def __round(self, n: int):
-        return int(n * self.__FACTOR_ROUND) / self.__FACTOR_ROUND
+        return np.trunc(np.asarray(x) * self.__FACTOR_ROUND) / self.__FACTOR_ROUND
 
     def __analyze_pivot_points(self):
         """
@@ -191,180 +249,153 @@ class EsPriceAnalysis:
         Otherwise, no rebound happened.
         """
 
+        # Get the columns used by the analysis once as arrays and mask the days with PP interaction
+        col_first_rebound = self.__es_price_df[self.__KEY_FIRST_REBOUND].to_numpy()
+        col_second_rebound = self.__es_price_df[self.__KEY_SECOND_REBOUND].to_numpy()
+        col_pt_deep_rebound = self.__es_price_df[self.__KEY_PT_DEEP_REBOUND].to_numpy()
+        col_no_perfect_rebound = self.__es_price_df[self.__KEY_NO_PERFECT_REBOUND].to_numpy()
+        mask_first_rebound = pd.notna(col_first_rebound)
+        mask_second_rebound = pd.notna(col_second_rebound)
+        mask_deep_rebound = pd.notna(col_pt_deep_rebound)
+        mask_no_perfect_rebound = pd.notna(col_no_perfect_rebound)
+
         # Get row indexes of days with PP interaction
-        rows_first_rebound = self.__es_price_df[self.__es_price_df[self.__KEY_FIRST_REBOUND].notnull()].index.tolist()
-        rows_second_rebound = self.__es_price_df[self.__es_price_df[self.__KEY_SECOND_REBOUND].notnull()].index.tolist()
-        rows_perfect_rebound = rows_first_rebound + rows_second_rebound
-        rows_deep_rebound = self.__es_price_df[self.__es_price_df[self.__KEY_PT_DEEP_REBOUND].notnull()].index.tolist()
-        rows_no_perfect_rebound = self.__es_price_df[self.__es_price_df[self.__KEY_NO_PERFECT_REBOUND].notnull()].index.tolist()
-        rows_no_rebound = [i for i in rows_no_perfect_rebound if i not in rows_deep_rebound]
+        rows_first_rebound = np.flatnonzero(mask_first_rebound)
+        rows_second_rebound = np.flatnonzero(mask_second_rebound)
+        rows_perfect_rebound = np.concatenate([rows_first_rebound, rows_second_rebound])
+        rows_deep_rebound = np.flatnonzero(mask_deep_rebound)
+        rows_no_perfect_rebound = np.flatnonzero(mask_no_perfect_rebound)
+        mask_no_rebound = mask_no_perfect_rebound & ~mask_deep_rebound
+        rows_no_rebound = np.flatnonzero(mask_no_rebound)
+
+        stats_general = self.__stats_pivot_points["General"]
+        stats_days_demark = self.__stats_pivot_points["Days with demark"]
+        stats_pivot = self.__stats_pivot_points["Pivot"]
+        stats_support = self.__stats_pivot_points["Support"]
+        stats_resistance = self.__stats_pivot_points["Resistance"]
 
         # Get number of Demark points
-        self.__stats_pivot_points["General"]["count perfect rebound"] = len(rows_perfect_rebound)
-        self.__stats_pivot_points["General"]["count deep rebound"] = len(rows_deep_rebound)
-        self.__stats_pivot_points["General"]["count rebound"] = self.__stats_pivot_points["General"]["count perfect rebound"] + self.__stats_pivot_points["General"]["count deep rebound"]
-        self.__stats_pivot_points["General"]["count no perfect rebound"] = len(rows_no_perfect_rebound)
-        self.__stats_pivot_points["General"]["count no rebound"] = len(rows_no_rebound)
-        self.__stats_pivot_points["General"]["count points"] = self.__stats_pivot_points["General"]["count rebound"] + self.__stats_pivot_points["General"]["count no rebound"]
-        self.__stats_pivot_points["General"]["total days"] = len(self.__es_price_df["Date"])
-
-        point_perfect_rebound = [self.__es_price_df.iloc[i][self.__KEY_FIRST_REBOUND] for i in rows_first_rebound] + [self.__es_price_df.iloc[i][self.__KEY_SECOND_REBOUND] for i in rows_second_rebound]
-        point_deep_rebound = [self.__es_price_df.iloc[i][self.__KEY_NO_PERFECT_REBOUND] for i in rows_deep_rebound]
-        pt_deep_rebound = [self.__es_price_df.iloc[i][self.__KEY_PT_DEEP_REBOUND] for i in rows_deep_rebound]
-        pt_deep_rebound_pivot = [self.__es_price_df.iloc[i][self.__KEY_PT_DEEP_REBOUND] for i in rows_deep_rebound if self.__es_price_df.iloc[i][
-            self.__KEY_NO_PERFECT_REBOUND] == "PP"]
-        pt_deep_rebound_support = [self.__es_price_df.iloc[i][self.__KEY_PT_DEEP_REBOUND] for i in rows_deep_rebound if self.__es_price_df.iloc[i][
-            self.__KEY_NO_PERFECT_REBOUND] == "S"]
-        pt_deep_rebound_resistance = [self.__es_price_df.iloc[i][self.__KEY_PT_DEEP_REBOUND] for i in rows_deep_rebound if self.__es_price_df.iloc[
-            i][self.__KEY_NO_PERFECT_REBOUND] == "R"]
-        point_no_rebound = [self.__es_price_df.iloc[i][self.__KEY_NO_PERFECT_REBOUND] for i in rows_no_rebound]
-        days_with_perfect_rebound = rows_first_rebound
-        days_with_deep_rebound = rows_deep_rebound
-        days_with_no_rebound = rows_no_rebound
-        days_with_no_perfect_rebound = rows_no_perfect_rebound
-        days_with_rebound = list(set(days_with_perfect_rebound + days_with_deep_rebound))
-        days_with_demark = list(set(days_with_rebound + days_with_no_rebound))
-        days_with_no_demark = [i for i in range(self.__stats_pivot_points["General"]["total days"]) if i not in days_with_demark]
+        count_perfect_rebound = len(rows_perfect_rebound)
+        count_deep_rebound = len(rows_deep_rebound)
+        count_rebound = count_perfect_rebound + count_deep_rebound
+        count_no_rebound = len(rows_no_rebound)
+        count_points = count_rebound + count_no_rebound
+        total_days = len(col_first_rebound)
+        stats_general["count perfect rebound"] = count_perfect_rebound
+        stats_general["count deep rebound"] = count_deep_rebound
+        stats_general["count rebound"] = count_rebound
+        stats_general["count no perfect rebound"] = len(rows_no_perfect_rebound)
+        stats_general["count no rebound"] = count_no_rebound
+        stats_general["count points"] = count_points
+        stats_general["total days"] = total_days
+        # percentage of a single point (day) over each total: the percentages below are then plain multiplications
+        pct_per_point = 100. / count_points
+        pct_per_rebound = 100. / count_rebound
+        pct_per_perfect_rebound = 100. / count_perfect_rebound
+        pct_per_deep_rebound = 100. / count_deep_rebound
+        pct_per_no_rebound = 100. / count_no_rebound
+        pct_per_day = 100. / total_days
+
+        point_perfect_rebound = np.concatenate([col_first_rebound[mask_first_rebound], col_second_rebound[mask_second_rebound]])
+        point_deep_rebound = col_no_perfect_rebound[mask_deep_rebound]
+        pt_deep_rebound = col_pt_deep_rebound[mask_deep_rebound]
+        # split the deep rebound points by point type in a single pass over the deep rebound days
+        deep_rebound_df = self.__es_price_df.loc[mask_deep_rebound, [self.__KEY_NO_PERFECT_REBOUND, self.__KEY_PT_DEEP_REBOUND]]
+        pt_deep_rebound_point_type = {point: pt.to_numpy() for point, pt in
+                                      deep_rebound_df.groupby(self.__KEY_NO_PERFECT_REBOUND, observed=True)[self.__KEY_PT_DEEP_REBOUND]}
+        point_no_rebound = col_no_perfect_rebound[rows_no_rebound]
+        # one flag per day: union and difference of days are element-wise | and & ~
+        days_with_perfect_rebound = mask_first_rebound
+        days_with_deep_rebound = mask_deep_rebound
+        days_with_no_rebound = mask_no_rebound
+        days_with_no_perfect_rebound = mask_no_perfect_rebound
+        days_with_rebound = days_with_perfect_rebound | days_with_deep_rebound
+        days_with_demark = days_with_rebound | days_with_no_rebound
+        days_with_no_demark = ~days_with_demark
 
         demark_days_with_rebound = days_with_rebound
-        demark_days_with_rebound_only = [i for i in days_with_rebound if i not in days_with_no_rebound]
-        demark_days_with_perfect_rebound_only = [i for i in days_with_perfect_rebound if i not in days_with_no_perfect_rebound]
-        demark_days_with_deep_rebound_only = [i for i in days_with_deep_rebound if i not in days_with_perfect_rebound]
-        demark_days_with_no_rebound_only = [i for i in days_with_no_rebound if i not in days_with_rebound]
+        demark_days_with_rebound_only = days_with_rebound & ~days_with_no_rebound
+        demark_days_with_perfect_rebound_only = days_with_perfect_rebound & ~days_with_no_perfect_rebound
+        demark_days_with_deep_rebound_only = days_with_deep_rebound & ~days_with_perfect_rebound
+        demark_days_with_no_rebound_only = days_with_no_rebound & ~days_with_rebound
         demark_days_with_no_rebound = days_with_no_rebound
 
         # Analyze data
-        self.__stats_pivot_points["Days with demark"]["count"] = len(days_with_demark)
-        self.__stats_pivot_points["Days with demark"]["with rebound"] = 100. * len(demark_days_with_rebound) / self.__stats_pivot_points["Days with demark"]["count"]
-        self.__stats_pivot_points["Days with demark"]["only rebound"] = 100. * len(demark_days_with_rebound_only) / self.__stats_pivot_points["Days with demark"]["count"]
-        self.__stats_pivot_points["Days with demark"]["only perfect rebound"] = 100. * len(demark_days_with_perfect_rebound_only) / self.__stats_pivot_points["Days with demark"]["count"]
-        self.__stats_pivot_points["Days with demark"]["only deep rebound"] = 100. * len(demark_days_with_deep_rebound_only) / self.__stats_pivot_points["Days with demark"]["count"]
-        self.__stats_pivot_points["Days with demark"]["only no rebound"] = 100. * len(demark_days_with_no_rebound_only) / self.__stats_pivot_points["Days with demark"]["count"]
-        self.__stats_pivot_points["Days with demark"]["with no rebound"] = 100. * len(demark_days_with_no_rebound) / self.__stats_pivot_points["Days with demark"]["count"]
-        self.__stats_pivot_points["Days with demark"]["with perfect rebound"] = 100. * len(days_with_perfect_rebound) / \
-                                                                           self.__stats_pivot_points[
-                                                                               "Days with demark"]["count"]
-        self.__stats_pivot_points["Days with demark"]["with deep rebound"] = 100. * len(days_with_deep_rebound) / \
-                                                                                self.__stats_pivot_points[
-                                                                                    "Days with demark"]["count"]
-
-        self.__stats_pivot_points["General"]["pct days with rebound"] = 100. * len(days_with_rebound) / self.__stats_pivot_points["General"]["total days"]
-        self.__stats_pivot_points["General"]["pct days no demark"] = 100. * len(days_with_no_demark) / \
-                                                                        self.__stats_pivot_points["General"][
-                                                                            "total days"]
-        self.__stats_pivot_points["General"]["pct days with demark"] = 100. * len(days_with_demark) / \
-                                                                     self.__stats_pivot_points["General"][
-                                                                         "total days"]
-
-        self.__stats_pivot_points["General"]["pct rebound"] = 100. * (self.__stats_pivot_points["General"]["count rebound"]) / self.__stats_pivot_points["General"]["count points"]
-        self.__stats_pivot_points["General"]["pct no rebound"] = 100. * self.__stats_pivot_points["General"]["count no rebound"] / self.__stats_pivot_points["General"]["count points"]
-        self.__stats_pivot_points["General"]["pct perfect rebound"] = 100. * self.__stats_pivot_points["General"]["count perfect rebound"] / self.__stats_pivot_points["General"]["count points"]
-        self.__stats_pivot_points["General"]["pct deep rebound"] = 100. * self.__stats_pivot_points["General"]["count deep rebound"] / self.__stats_pivot_points["General"]["count points"]
-        self.__stats_pivot_points["General"]["pct perfect rebound if rebound"] = 100. * self.__stats_pivot_points["General"]["count perfect rebound"] / self.__stats_pivot_points["General"]["count rebound"]
-        self.__stats_pivot_points["General"]["pt deep rebound"] = [self.__es_price_df.iloc[i][self.__KEY_PT_DEEP_REBOUND] for i in rows_deep_rebound]
-        count_pp_perfect_rebound, count_pp_deep_rebound, count_pp_no_rebound = self.__count_point("PP",
-                                                                                                  point_perfect_rebound,
-                                                                                                  point_deep_rebound,
-                                                                                                  point_no_rebound)
-        count_pp_total = count_pp_perfect_rebound + count_pp_deep_rebound + count_pp_no_rebound
-        self.__stats_pivot_points["Pivot"]["pct pivot perfect rebound"] = 100. * count_pp_perfect_rebound / self.__stats_pivot_points["General"]["count perfect rebound"]
-        self.__stats_pivot_points["Pivot"]["pct pivot deep rebound"] = 100. * count_pp_deep_rebound / self.__stats_pivot_points["General"]["count deep rebound"]
-        self.__stats_pivot_points["Pivot"]["pct pivot rebound"] = 100. * (count_pp_perfect_rebound + count_pp_deep_rebound) / self.__stats_pivot_points["General"]["count rebound"]
-        self.__stats_pivot_points["Pivot"]["pct pivot no rebound"] = 100. * count_pp_no_rebound / self.__stats_pivot_points["General"]["count no rebound"]
-        self.__stats_pivot_points["Pivot"]["pct point"] = 100. * count_pp_total / self.__stats_pivot_points["General"]["count points"]
-        self.__stats_pivot_points["Pivot"]["pct perfect rebound"] = 100. * count_pp_perfect_rebound / count_pp_total
-        self.__stats_pivot_points["Pivot"]["pct deep rebound"] = 100. * count_pp_deep_rebound / count_pp_total
-        self.__stats_pivot_points["Pivot"]["pct rebound"] = 100. * (count_pp_perfect_rebound + count_pp_deep_rebound) / count_pp_total
-        self.__stats_pivot_points["Pivot"]["pct no rebound"] = 100. * count_pp_no_rebound / count_pp_total
-        self.__stats_pivot_points["Pivot"]["pt deep rebound"] = [self.__es_price_df.iloc[i][self.__KEY_PT_DEEP_REBOUND] for i in rows_deep_rebound
-                                                                 if self.__es_price_df.iloc[i][self.__KEY_NO_PERFECT_REBOUND] == "PP"]
-
-        count_support_perfect_rebound, count_support_deep_rebound, count_support_no_rebound = self.__count_point("S",
-                                                                                                                 point_perfect_rebound,
-                                                                                                                 point_deep_rebound,
-                                                                                                                 point_no_rebound)
-        count_support_total = count_support_perfect_rebound + count_support_deep_rebound + count_support_no_rebound
-        self.__stats_pivot_points["Support"]["pct support perfect rebound"] = 100. * count_support_perfect_rebound / self.__stats_pivot_points["General"]["count perfect rebound"]
-        self.__stats_pivot_points["Support"]["pct support deep rebound"] = 100. * count_support_deep_rebound / self.__stats_pivot_points["General"]["count deep rebound"]
-        self.__stats_pivot_points["Support"]["pct support rebound"] = 100. * (count_support_perfect_rebound + count_support_deep_rebound) / self.__stats_pivot_points["General"]["count rebound"]
-        self.__stats_pivot_points["Support"]["pct support no rebound"] = 100. * count_support_no_rebound / self.__stats_pivot_points["General"]["count no rebound"]
-        self.__stats_pivot_points["Support"]["pct point"] = 100. * count_support_total / self.__stats_pivot_points["General"]["count points"]
-        self.__stats_pivot_points["Support"]["pct perfect rebound"] = 100. * count_support_perfect_rebound / count_support_total
-        self.__stats_pivot_points["Support"]["pct deep rebound"] = 100. * count_support_deep_rebound / count_support_total
-        self.__stats_pivot_points["Support"]["pct rebound"] = 100. * (
-                    count_support_perfect_rebound + count_support_deep_rebound) / count_support_total
-        self.__stats_pivot_points["Support"]["pct no rebound"] = 100. * count_support_no_rebound / count_support_total
-        self.__stats_pivot_points["Support"]["pt deep rebound"] = [self.__es_price_df.iloc[i][self.__KEY_PT_DEEP_REBOUND]
-                                                                   for i in rows_deep_rebound if self.__es_price_df.iloc[i][
-                                                                       self.__KEY_NO_PERFECT_REBOUND] == "S"]
-
-        count_resistance_perfect_rebound, count_resistance_deep_rebound, count_resistance_no_rebound = self.__count_point("R",
-                                                                                                  point_perfect_rebound,
-                                                                                                  point_deep_rebound,
-                                                                                                  point_no_rebound)
-        count_resistance_total = count_resistance_perfect_rebound + count_resistance_deep_rebound + count_resistance_no_rebound
-        self.__stats_pivot_points["Resistance"]["pct resistance perfect rebound"] = 100. * count_resistance_perfect_rebound / self.__stats_pivot_points["General"]["count perfect rebound"]
-        self.__stats_pivot_points["Resistance"]["pct resistance deep rebound"] = 100. * count_resistance_deep_rebound / self.__stats_pivot_points["General"]["count deep rebound"]
-        self.__stats_pivot_points["Resistance"]["pct resistance rebound"] = 100. * (count_resistance_perfect_rebound + count_resistance_deep_rebound) / self.__stats_pivot_points["General"]["count rebound"]
-        self.__stats_pivot_points["Resistance"]["pct resistance no rebound"] = 100. * count_resistance_no_rebound / self.__stats_pivot_points["General"]["count no rebound"]
-        self.__stats_pivot_points["Resistance"]["pct point"] = 100. * count_resistance_total / self.__stats_pivot_points["General"]["count points"]
-        self.__stats_pivot_points["Resistance"]["pct perfect rebound"] = 100. * count_resistance_perfect_rebound / count_resistance_total
-        self.__stats_pivot_points["Resistance"]["pct deep rebound"] = 100. * count_resistance_deep_rebound / count_resistance_total
-        self.__stats_pivot_points["Resistance"]["pct rebound"] = 100. * (
-                    count_resistance_perfect_rebound + count_resistance_deep_rebound) / count_resistance_total
-        self.__stats_pivot_points["Resistance"]["pct no rebound"] = 100. * count_resistance_no_rebound / count_resistance_total
-        self.__stats_pivot_points["Resistance"]["pt deep rebound"] = [self.__es_price_df.iloc[i][self.__KEY_PT_DEEP_REBOUND]
-                                                                      for i in rows_deep_rebound if self.__es_price_df.iloc[i][
-                                                                          self.__KEY_NO_PERFECT_REBOUND] == "R"]
-
-        cdf_deep_rebound = self.__calc_cpf(pt_deep_rebound, int(max(pt_deep_rebound)))
+        count_days_demark = np.count_nonzero(days_with_demark)
+        stats_days_demark["count"] = count_days_demark
+        pct_per_day_demark = 100. / count_days_demark
+        stats_days_demark["with rebound"] = np.count_nonzero(demark_days_with_rebound) * pct_per_day_demark
+        stats_days_demark["only rebound"] = np.count_nonzero(demark_days_with_rebound_only) * pct_per_day_demark
+        stats_days_demark["only perfect rebound"] = np.count_nonzero(demark_days_with_perfect_rebound_only) * pct_per_day_demark
+        stats_days_demark["only deep rebound"] = np.count_nonzero(demark_days_with_deep_rebound_only) * pct_per_day_demark
+        stats_days_demark["only no rebound"] = np.count_nonzero(demark_days_with_no_rebound_only) * pct_per_day_demark
+        stats_days_demark["with no rebound"] = np.count_nonzero(demark_days_with_no_rebound) * pct_per_day_demark
+        stats_days_demark["with perfect rebound"] = np.count_nonzero(days_with_perfect_rebound) * pct_per_day_demark
+        stats_days_demark["with deep rebound"] = np.count_nonzero(days_with_deep_rebound) * pct_per_day_demark
+
+        stats_general["pct days with rebound"] = np.count_nonzero(days_with_rebound) * pct_per_day
+        stats_general["pct days no demark"] = np.count_nonzero(days_with_no_demark) * pct_per_day
+        stats_general["pct days with demark"] = np.count_nonzero(days_with_demark) * pct_per_day
+
+        stats_general["pct rebound"] = count_rebound * pct_per_point
+        stats_general["pct no rebound"] = count_no_rebound * pct_per_point
+        stats_general["pct perfect rebound"] = count_perfect_rebound * pct_per_point
+        stats_general["pct deep rebound"] = count_deep_rebound * pct_per_point
+        stats_general["pct perfect rebound if rebound"] = count_perfect_rebound * pct_per_rebound
+        stats_general["pt deep rebound"] = pt_deep_rebound.tolist()
+        # count each point type per rebound type with a single crosstab
+        points = np.concatenate([point_perfect_rebound, point_deep_rebound, point_no_rebound])
+        rebound_types = np.repeat(["perfect", "deep", "no"], [len(point_perfect_rebound), len(point_deep_rebound), len(point_no_rebound)])
+        count_point_rebound = pd.crosstab(points, rebound_types).reindex(index=["PP", "S", "R"], columns=["perfect", "deep", "no"],
+                                                                         fill_value=0)
+        for stats_point, point, name in ((stats_pivot, "PP", "pivot"), (stats_support, "S", "support"), (stats_resistance, "R", "resistance")):
+            count_point_perfect_rebound, count_point_deep_rebound, count_point_no_rebound = count_point_rebound.loc[point]
+            count_point_total = count_point_perfect_rebound + count_point_deep_rebound + count_point_no_rebound
+            pct_per_point_type = 100. / count_point_total
+            stats_point["pct " + name + " perfect rebound"] = count_point_perfect_rebound * pct_per_perfect_rebound
+            stats_point["pct " + name + " deep rebound"] = count_point_deep_rebound * pct_per_deep_rebound
+            stats_point["pct " + name + " rebound"] = (count_point_perfect_rebound + count_point_deep_rebound) * pct_per_rebound
+            stats_point["pct " + name + " no rebound"] = count_point_no_rebound * pct_per_no_rebound
+            stats_point["pct point"] = count_point_total * pct_per_point
+            stats_point["pct perfect rebound"] = count_point_perfect_rebound * pct_per_point_type
+            stats_point["pct deep rebound"] = count_point_deep_rebound * pct_per_point_type
+            stats_point["pct rebound"] = (count_point_perfect_rebound + count_point_deep_rebound) * pct_per_point_type
+            stats_point["pct no rebound"] = count_point_no_rebound * pct_per_point_type
+            stats_point["pt deep rebound"] = pt_deep_rebound_point_type.get(point, np.empty(0)).tolist()
+
+        # the cumulative probabilities of all the points and of each point type share the same bins
+        bin_max_deep_rebound = int(pt_deep_rebound.max())
+        cdf_deep_rebound = self.__calc_cpf(pt_deep_rebound, bin_max_deep_rebound)
+        labels_deep_rebound = [str(x) for x in cdf_deep_rebound["x"]]
         self.__stats_deep_rebound["General"][" "] = "Demark"
         self.__stats_deep_rebound["General"]["% of deep rebounds"] = 100
         self.__stats_deep_rebound["General"]["mean"] = np.mean(pt_deep_rebound)
-        for i, x in enumerate(cdf_deep_rebound["x"]):
-            self.__stats_deep_rebound["General"][str(int(x))] = cdf_deep_rebound["cpf"][i]
-
-        cdf_deep_rebound_pivot = self.__calc_cpf(pt_deep_rebound_pivot, int(max(pt_deep_rebound)))
-        self.__stats_deep_rebound["Pivot"][" "] = "pivot"
-        self.__stats_deep_rebound["Pivot"]["% of deep rebounds"] = 100. * len(pt_deep_rebound_pivot) / len(pt_deep_rebound)
-        self.__stats_deep_rebound["Pivot"]["mean"] = np.mean(pt_deep_rebound_pivot)
-        for i, x in enumerate(cdf_deep_rebound_pivot["x"]):
-            self.__stats_deep_rebound["Pivot"][str(int(x))] = cdf_deep_rebound_pivot["cpf"][i]
-
-        cdf_deep_rebound_support = self.__calc_cpf(pt_deep_rebound_support, int(max(pt_deep_rebound)))
-        self.__stats_deep_rebound["Support"][" "] = "support"
-        self.__stats_deep_rebound["Support"]["% of deep rebounds"] = 100. * len(pt_deep_rebound_support) / len(
-            pt_deep_rebound)
-        self.__stats_deep_rebound["Support"]["mean"] = np.mean(pt_deep_rebound_support)
-        for i, x in enumerate(cdf_deep_rebound_support["x"]):
-            self.__stats_deep_rebound["Support"][str(int(x))] = cdf_deep_rebound_support["cpf"][i]
-
-        cdf_deep_rebound_resistance = self.__calc_cpf(pt_deep_rebound_resistance, int(max(pt_deep_rebound)))
-        self.__stats_deep_rebound["Resistance"][" "] = "resistance"
-        self.__stats_deep_rebound["Resistance"]["% of deep rebounds"] = 100. * len(pt_deep_rebound_resistance) / len(
-            pt_deep_rebound)
-        self.__stats_deep_rebound["Resistance"]["mean"] = np.mean(pt_deep_rebound_resistance)
-        for i, x in enumerate(cdf_deep_rebound_resistance["x"]):
-            self.__stats_deep_rebound["Resistance"][str(int(x))] = cdf_deep_rebound_resistance["cpf"][i]
-
-        # Analysis no rebound
-        trend_no_rebound = [self.__es_price_df.iloc[i][self.__KEY_TREND] for i in rows_no_rebound]
-        es_pp_no_rebound = [self.__es_price_df.iloc[i][self.__KEY_ES_PP] for i in rows_no_rebound]
+        self.__stats_deep_rebound["General"].update(zip(labels_deep_rebound, cdf_deep_rebound["cpf"]))
+
+        for key, point, name in (("Pivot", "PP", "pivot"), ("Support", "S", "support"), ("Resistance", "R", "resistance")):
+            pt_deep_rebound_point = pt_deep_rebound_point_type.get(point, np.empty(0))
+            cdf_deep_rebound_point = self.__calc_cpf(pt_deep_rebound_point, bin_max_deep_rebound)
+            self.__stats_deep_rebound[key][" "] = name
+            self.__stats_deep_rebound[key]["% of deep rebounds"] = 100. * len(pt_deep_rebound_point) / len(pt_deep_rebound)
+            self.__stats_deep_rebound[key]["mean"] = np.mean(pt_deep_rebound_point)
+            self.__stats_deep_rebound[key].update(zip(labels_deep_rebound, cdf_deep_rebound_point["cpf"]))
+
+        # Analysis no rebound: the trend and ES & PP masks are shared by all the analyses
         count_days_no_rebound = len(rows_no_rebound)
         self.__stats_no_rebound["Range"][" "] = " "
-        self.__stats_no_rebound["Range"]["% uptrend"] = 100. * trend_no_rebound.count(1) / count_days_no_rebound
-        self.__stats_no_rebound["Range"]["% downtrend"] = 100. * trend_no_rebound.count(-1) / count_days_no_rebound
-        self.__stats_no_rebound["Range"]["% range"] = 100. * trend_no_rebound.count(0) / count_days_no_rebound
+        self.__stats_no_rebound["Range"]["% uptrend"] = 100. * np.count_nonzero(self.__mask_uptrend & mask_no_rebound) / count_days_no_rebound
+        self.__stats_no_rebound["Range"]["% downtrend"] = 100. * np.count_nonzero(self.__mask_downtrend & mask_no_rebound) / count_days_no_rebound
+        self.__stats_no_rebound["Range"]["% range"] = 100. * np.count_nonzero(self.__mask_range & mask_no_rebound) / count_days_no_rebound
         self.__stats_no_rebound["ES PP"][" "] = " "
-        self.__stats_no_rebound["ES PP"]["% es<PP (8:30)"] = 100. * (
-                es_pp_no_rebound.count(0) + es_pp_no_rebound.count(2)) / count_days_no_rebound
-        self.__stats_no_rebound["ES PP"]["% es>PP (8:30)"] = 100. * (
-                    es_pp_no_rebound.count(1) + es_pp_no_rebound.count(-1)) / count_days_no_rebound
+        self.__stats_no_rebound["ES PP"]["% es<PP (8:30)"] = 100. * np.count_nonzero(
+            self.__mask_es_lower_pp_start & mask_no_rebound) / count_days_no_rebound
+        self.__stats_no_rebound["ES PP"]["% es>PP (8:30)"] = 100. * np.count_nonzero(
+            self.__mask_es_higher_pp_start & mask_no_rebound) / count_days_no_rebound
 
         self.__stats_no_rebound["Point"][" "] = " "
-        self.__stats_no_rebound["Point"]["% resistance"] = 100. * point_no_rebound.count("R") / count_days_no_rebound
-        self.__stats_no_rebound["Point"]["% pivot"] = 100. * point_no_rebound.count("PP") / count_days_no_rebound
-        self.__stats_no_rebound["Point"]["% support"] = 100. * point_no_rebound.count("S") / count_days_no_rebound
+        self.__stats_no_rebound["Point"]["% resistance"] = 100. * count_point_rebound.loc["R", "no"] / count_days_no_rebound
+        self.__stats_no_rebound["Point"]["% pivot"] = 100. * count_point_rebound.loc["PP", "no"] / count_days_no_rebound
+        self.__stats_no_rebound["Point"]["% support"] = 100. * count_point_rebound.loc["S", "no"] / count_days_no_rebound
 
     def __analyze_reversal(self):
         self.__analyze_general_reversal()
@@ -372,234 +403,155 @@ class EsPriceAnalysis:
         self.__analyze_reversal_es_start_pivot()
 
     def __analyze_general_reversal(self):
-        self.__es_price_with_reversal_df = self.__es_price_df[self.__es_price_df['Hour trend change'].notnull()]
-        self.__stats_reversal["General"]["count days with reversal"] = len(self.__es_price_with_reversal_df.index)
+        self.__stats_reversal["General"]["count days with reversal"] = int(self.__es_price_df['Hour trend change'].notna().sum())
         self.__stats_reversal["General"]["pct with reversal"] = 100. * self.__stats_reversal["General"]["count days with reversal"] / self.__num_days
 
     def __analyze_reversal_each_trend(self):
-        # filter days for uptrend, downtrend and trade range
-        self.__es_uptrend_df = self.__es_price_df[self.__es_price_df['Trend since 8:30'] == 1]
-        self.__num_days_uptrend = len(self.__es_uptrend_df.index)
-        self.__es_downtrend_df = self.__es_price_df[self.__es_price_df['Trend since 8:30'] == -1]
-        self.__num_days_downtrend = len(self.__es_downtrend_df.index)
-        self.__es_range_df = self.__es_price_df[self.__es_price_df['Trend since 8:30'] == 0]
-        self.__num_days_range = len(self.__es_range_df.index)
-        hour_reversal = self.__es_price_df[self.__es_price_df["New trend"].notnull()]["Hour trend change"].values
-        cpf_hour_reversal = self.__calc_cpf_time(hour_reversal)
+        # boolean masks of the trend (shared, see query_data) and of the reversal, computed once on the column arrays
+        new_trend = self.__es_price_df["New trend"].to_numpy()
+        hour_trend_change = self.__es_price_df["Hour trend change"].to_numpy()
+        max_range = self.__es_price_df["Max Range 8:30 - 13"].to_numpy()
+        mask_uptrend = self.__mask_uptrend
+        mask_downtrend = self.__mask_downtrend
+        mask_range = self.__mask_range
+        mask_reversal = pd.notna(hour_trend_change)
+        mask_new_trend = pd.notna(new_trend)
+        mask_new_uptrend = new_trend == 1
+        mask_new_downtrend = new_trend == -1
+        mask_es_higher_pp = self.__mask_es_higher_pp_start
+        mask_es_lower_pp = self.__mask_es_lower_pp_start
+
+        # days for uptrend, downtrend and trade range
+        self.__num_days_uptrend = int(np.count_nonzero(mask_uptrend))
+        self.__num_days_downtrend = int(np.count_nonzero(mask_downtrend))
+        self.__num_days_range = int(np.count_nonzero(mask_range))
+        # the reversal hours are sorted once: the hours of any subset of days are then taken already sorted
+        order_hour_trend_change = np.argsort(hour_trend_change, kind="stable")
+        hour_trend_change_sorted = hour_trend_change[order_hour_trend_change]
+        hour_reversal = hour_trend_change_sorted[mask_new_trend[order_hour_trend_change]]
+        cpf_hour_reversal = self.__calc_cpf_time(hour_reversal, is_sorted=True)
         self.__stats_hour_reversal["General"][" "] = "any"
-        for i, t in enumerate(cpf_hour_reversal["x"]):
-            self.__stats_hour_reversal["General"]["% " + t.strftime('%H:%M')] = cpf_hour_reversal["cpf"][i]
-
-        # filter days with reversal according to trend
-        self.__es_uptrend_then_reversal_df = self.__es_uptrend_df[self.__es_uptrend_df['Hour trend change'].notnull()]
-        es_uptrend_then_downtrend_df = self.__es_uptrend_then_reversal_df[self.__es_uptrend_then_reversal_df["New trend"] == -1]
-        self.__es_downtrend_then_reversal_df = self.__es_downtrend_df[self.__es_downtrend_df['Hour trend change'].notnull()]
-        es_downtrend_then_uptrend_df = self.__es_downtrend_then_reversal_df[
-            self.__es_downtrend_then_reversal_df["New trend"] == 1]
-        self.__es_range_then_reversal_df = self.__es_range_df[self.__es_range_df['Hour trend change'].notnull()]
-        es_range_then_uptrend_df = self.__es_range_then_reversal_df[self.__es_range_then_reversal_df["New trend"] == 1]
-        es_range_then_downtrend_df = self.__es_range_then_reversal_df[self.__es_range_then_reversal_df["New trend"] == -1]
-        self.__pct_uptrend_then_reversal = 100. * len(self.__es_uptrend_then_reversal_df.index) / self.__num_days_uptrend
-        self.__pct_downtrend_then_reversal = 100. * len(self.__es_downtrend_then_reversal_df.index) / self.__num_days_downtrend
-        self.__pct_range_then_reversal = 100. * len(self.__es_range_then_reversal_df.index) / self.__num_days_range
+        self.__stats_hour_reversal["General"].update(zip(self.__labels_cpf_time, cpf_hour_reversal["cpf"]))
+
+        # days with reversal according to trend: masks and counts are computed once and reused for all the trend statistics
+        self.__mask_uptrend_then_reversal = mask_uptrend & mask_reversal
+        self.__mask_downtrend_then_reversal = mask_downtrend & mask_reversal
+        self.__mask_range_then_reversal = mask_range & mask_reversal
+        self.__count_uptrend_then_reversal = int(np.count_nonzero(self.__mask_uptrend_then_reversal))
+        self.__count_downtrend_then_reversal = int(np.count_nonzero(self.__mask_downtrend_then_reversal))
+        self.__count_range_then_reversal = int(np.count_nonzero(self.__mask_range_then_reversal))
+        count_uptrend_then_downtrend = np.count_nonzero(self.__mask_uptrend_then_reversal & mask_new_downtrend)
+        count_downtrend_then_uptrend = np.count_nonzero(self.__mask_downtrend_then_reversal & mask_new_uptrend)
+        count_range_then_uptrend = np.count_nonzero(self.__mask_range_then_reversal & mask_new_uptrend)
+        count_range_then_downtrend = np.count_nonzero(self.__mask_range_then_reversal & mask_new_downtrend)
+        self.__pct_uptrend_then_reversal = 100. * self.__count_uptrend_then_reversal / self.__num_days_uptrend
+        self.__pct_downtrend_then_reversal = 100. * self.__count_downtrend_then_reversal / self.__num_days_downtrend
+        self.__pct_range_then_reversal = 100. * self.__count_range_then_reversal / self.__num_days_range
 
         # save stats
-        self.__stats_reversal["reversal day"][" "] = str(self.__stats_reversal["General"]["count days with reversal"]) + " days with reversal"
-        self.__stats_reversal["reversal day"]["% down then up"] = 100. * len(es_downtrend_then_uptrend_df.index) / self.__stats_reversal["General"]["count days with reversal"]
-        self.__stats_reversal["reversal day"]["% up then down"] = 100. * len(es_uptrend_then_downtrend_df.index) / \
-                                                                self.__stats_reversal["General"][
-                                                                    "count days with reversal"]
-        self.__stats_reversal["reversal day"]["% range then up"] = 100. * len(es_range_then_uptrend_df.index) / \
-                                                                self.__stats_reversal["General"][
-                                                                    "count days with reversal"]
-        self.__stats_reversal["reversal day"]["% range then down"] = 100. * len(es_range_then_downtrend_df.index) / \
-                                                                self.__stats_reversal["General"][
-                                                                    "count days with reversal"]
-
-        # uptrend day
-        count_uptrend_days = len(self.__es_uptrend_df.index)
-        range_uptrend_no_reversal_days = self.__es_uptrend_df[self.__es_uptrend_df["New trend"].isnull()][
-            "Max Range 8:30 - 13"].values
-        range_uptrend_with_reversal_days = self.__es_uptrend_df[self.__es_uptrend_df["New trend"].notnull()][
-            "Max Range 8:30 - 13"].values
-        self.__stats_reversal["uptrend day"][" "] = str(count_uptrend_days) + " uptrend days"
-        self.__stats_reversal["uptrend day"]["% with reversal*"] = 100. * len(self.__es_uptrend_then_reversal_df.index) / count_uptrend_days
-        uptrend_then_reversal_es_higher_pp = self.__es_uptrend_then_reversal_df[
-            (self.__es_uptrend_then_reversal_df['ES & PP'] == 1) | (self.__es_uptrend_then_reversal_df['ES & PP'] == -1)]
-        uptrend_then_reversal_es_lower_pp = self.__es_uptrend_then_reversal_df[
-            (self.__es_uptrend_then_reversal_df['ES & PP'] == 0) | (self.__es_uptrend_then_reversal_df['ES & PP'] == 2)]
-        self.__stats_reversal["uptrend day"]["% reversal when ES<PP at 8:30am**"] = 100. * len(uptrend_then_reversal_es_lower_pp.index) / len(self.__es_uptrend_then_reversal_df.index)
-        self.__stats_reversal["uptrend day"]["% reversal when ES>PP at 8:30am**"] = 100. * len(uptrend_then_reversal_es_higher_pp.index) / len(self.__es_uptrend_then_reversal_df.index)
-        self.__stats_reversal["uptrend day"]["avg. range when no reversal [pt]"] = np.mean(range_uptrend_no_reversal_days)
-        self.__stats_reversal["uptrend day"]["avg. range when reversal [pt]"] = np.mean(
-            range_uptrend_with_reversal_days)
-        hour_reversal_uptrend = self.__es_uptrend_df[self.__es_uptrend_df["New trend"].notnull()]["Hour trend change"].values
-        cpf_hour_reversal_uptrend = self.__calc_cpf_time(hour_reversal_uptrend)
-        self.__stats_hour_reversal["Uptrend"][" "] = "uptrend"
-        for i, t in enumerate(cpf_hour_reversal_uptrend["x"]):
-            self.__stats_hour_reversal["Uptrend"]["% " + t.strftime('%H:%M')] = cpf_hour_reversal_uptrend["cpf"][i]
-
-        # downtrend day
-        count_downtrend_days = len(self.__es_downtrend_df.index)
-        range_downtrend_no_reversal_days = self.__es_downtrend_df[self.__es_downtrend_df["New trend"].isnull()]["Max Range 8:30 - 13"].values
-        range_downtrend_with_reversal_days = self.__es_downtrend_df[self.__es_downtrend_df["New trend"].notnull()]["Max Range 8:30 - 13"].values
-        self.__stats_reversal["downtrend day"][" "] = str(count_downtrend_days) + " downtrend days"
-        self.__stats_reversal["downtrend day"]["% with reversal*"] = 100. * len(
-            self.__es_downtrend_then_reversal_df.index) / count_downtrend_days
-        downtrend_then_reversal_es_higher_pp = self.__es_downtrend_then_reversal_df[
-            (self.__es_downtrend_then_reversal_df['ES & PP'] == 1) | (self.__es_downtrend_then_reversal_df['ES & PP'] == -1)]
-        downtrend_then_reversal_es_lower_pp = self.__es_downtrend_then_reversal_df[
-            (self.__es_downtrend_then_reversal_df['ES & PP'] == 0) | (self.__es_downtrend_then_reversal_df['ES & PP'] == 2)]
-        self.__stats_reversal["downtrend day"]["% reversal when ES<PP at 8:30am**"] = 100. * len(
-            downtrend_then_reversal_es_lower_pp.index) / len(self.__es_downtrend_then_reversal_df.index)
-        self.__stats_reversal["downtrend day"]["% reversal when ES>PP at 8:30am**"] = 100. * len(
-            downtrend_then_reversal_es_higher_pp.index) / len(self.__es_downtrend_then_reversal_df.index)
-        self.__stats_reversal["downtrend day"]["avg. range when no reversal [pt]"] = np.mean(range_downtrend_no_reversal_days)
-        self.__stats_reversal["downtrend day"]["avg. range when reversal [pt]"] = np.mean(
-            range_downtrend_with_reversal_days)
-        hour_reversal_downtrend = self.__es_downtrend_df[self.__es_downtrend_df["New trend"].notnull()]["Hour trend change"].values
-        cpf_hour_reversal_downtrend = self.__calc_cpf_time(hour_reversal_downtrend)
-        self.__stats_hour_reversal["Downtrend"][" "] = "downtrend"
-        for i, t in enumerate(cpf_hour_reversal_downtrend["x"]):
-            self.__stats_hour_reversal["Downtrend"]["% " + t.strftime('%H:%M')] = cpf_hour_reversal_downtrend["cpf"][i]
-
-        # range day
-        count_range_days = len(self.__es_range_df.index)
-        range_range_no_reversal_days = self.__es_range_df[self.__es_range_df["New trend"].isnull()]["Max Range 8:30 - 13"].values
-        range_range_with_reversal_days = self.__es_range_df[self.__es_range_df["New trend"].notnull()]["Max Range 8:30 - 13"].values
-        count_range_with_reversal = len(range_range_with_reversal_days)
-        range_then_uptrend_days_df = self.__es_range_df[self.__es_range_df["New trend"] == 1]
-        range_then_uptrend_range = range_then_uptrend_days_df["Max Range 8:30 - 13"].values
-        range_then_downtrend_days_df = self.__es_range_df[self.__es_range_df["New trend"] == -1]
-        range_then_downtrend_range = range_then_downtrend_days_df["Max Range 8:30 - 13"].values
+        count_days_with_reversal = self.__stats_reversal["General"]["count days with reversal"]
+        pct_reversal_day = 100. * np.array([count_downtrend_then_uptrend, count_uptrend_then_downtrend,
+                                            count_range_then_uptrend, count_range_then_downtrend]) / count_days_with_reversal
+        self.__stats_reversal["reversal day"][" "] = str(count_days_with_reversal) + " days with reversal"
+        self.__stats_reversal["reversal day"].update(zip(["% down then up", "% up then down", "% range then up", "% range then down"],
+                                                         pct_reversal_day))
+
+        # uptrend, downtrend and range day: each trend reads its own rows and writes its own statistics
+        for key, key_hour, name, mask_trend, mask_trend_then_reversal, count_trend_days, count_trend_then_reversal in (
+                ("uptrend day", "Uptrend", "uptrend", mask_uptrend, self.__mask_uptrend_then_reversal, self.__num_days_uptrend,
+                 self.__count_uptrend_then_reversal),
+                ("downtrend day", "Downtrend", "downtrend", mask_downtrend, self.__mask_downtrend_then_reversal, self.__num_days_downtrend,
+                 self.__count_downtrend_then_reversal),
+                ("range day", "Range", "range", mask_range, self.__mask_range_then_reversal, self.__num_days_range,
+                 self.__count_range_then_reversal)):
+            count_trend_then_reversal_es_higher_pp = np.count_nonzero(mask_trend_then_reversal & mask_es_higher_pp)
+            count_trend_then_reversal_es_lower_pp = np.count_nonzero(mask_trend_then_reversal & mask_es_lower_pp)
+            self.__stats_reversal[key][" "] = str(count_trend_days) + " " + name + " days"
+            self.__stats_reversal[key]["% with reversal*"] = 100. * count_trend_then_reversal / count_trend_days
+            self.__stats_reversal[key]["% reversal when ES<PP at 8:30am**"] = 100. * count_trend_then_reversal_es_lower_pp / count_trend_then_reversal
+            self.__stats_reversal[key]["% reversal when ES>PP at 8:30am**"] = 100. * count_trend_then_reversal_es_higher_pp / count_trend_then_reversal
+            self.__stats_reversal[key]["avg. range when no reversal [pt]"] = np.mean(max_range[mask_trend & ~mask_new_trend])
+            self.__stats_reversal[key]["avg. range when reversal [pt]"] = np.mean(max_range[mask_trend & mask_new_trend])
+            hour_reversal_trend = hour_trend_change_sorted[(mask_trend & mask_new_trend)[order_hour_trend_change]]
+            cpf_hour_reversal_trend = self.__calc_cpf_time(hour_reversal_trend, is_sorted=True)
+            self.__stats_hour_reversal[key_hour][" "] = name
+            self.__stats_hour_reversal[key_hour].update(zip(self.__labels_cpf_time, cpf_hour_reversal_trend["cpf"]))
+
+        # range day followed by a trend
+        range_range_no_reversal_days = max_range[mask_range & ~mask_new_trend]
+        count_range_with_reversal = np.count_nonzero(mask_range & mask_new_trend)
+        range_then_uptrend_range = max_range[mask_range & mask_new_uptrend]
+        range_then_downtrend_range = max_range[mask_range & mask_new_downtrend]
         self.__range_then_reversal[" "] = str(count_range_with_reversal) + " range with reversal days"
-        self.__range_then_reversal["% uptrend reversal"] = 100. * len(range_then_uptrend_days_df.index) / count_range_with_reversal
-        self.__range_then_reversal["% downtrend reversal"] = 100. * len(range_then_downtrend_days_df.index) / count_range_with_reversal
+        self.__range_then_reversal["% uptrend reversal"] = 100. * len(range_then_uptrend_range) / count_range_with_reversal
+        self.__range_then_reversal["% downtrend reversal"] = 100. * len(range_then_downtrend_range) / count_range_with_reversal
         self.__range_then_reversal["avg. pt range no reversal"] = np.mean(range_range_no_reversal_days)
         self.__range_then_reversal["avg. pt range then uptrend"] = np.mean(range_then_uptrend_range)
         self.__range_then_reversal["avg. pt range then downtrend"] = np.mean(range_then_downtrend_range)
 
-        self.__stats_reversal["range day"][" "] = str(count_range_days) + " range days"
-        self.__stats_reversal["range day"]["% with reversal*"] = 100. * len(self.__es_range_then_reversal_df.index) / count_range_days
-        range_then_reversal_es_higher_pp = self.__es_range_then_reversal_df[
-            (self.__es_range_then_reversal_df['ES & PP'] == 1) | (self.__es_range_then_reversal_df['ES & PP'] == -1)]
-        range_then_reversal_es_lower_pp = self.__es_range_then_reversal_df[
-            (self.__es_range_then_reversal_df['ES & PP'] == 0) | (self.__es_range_then_reversal_df['ES & PP'] == 2)]
-        self.__stats_reversal["range day"]["% reversal when ES<PP at 8:30am**"] = 100. * len(range_then_reversal_es_lower_pp.index) / len(self.__es_downtrend_then_reversal_df.index)
-        self.__stats_reversal["range day"]["% reversal when ES>PP at 8:30am**"] = 100. * len(
-            range_then_reversal_es_higher_pp.index) / len(self.__es_range_then_reversal_df.index)
-        self.__stats_reversal["range day"]["avg. range when no reversal [pt]"] = np.mean(range_range_no_reversal_days)
-        self.__stats_reversal["range day"]["avg. range when reversal [pt]"] = np.mean(range_range_with_reversal_days)
-        hour_reversal_range = self.__es_range_df[self.__es_range_df["New trend"].notnull()]["Hour trend change"].values
-        cpf_hour_reversal_range = self.__calc_cpf_time(hour_reversal_range)
-        self.__stats_hour_reversal["Range"][" "] = "range"
-        for i, t in enumerate(cpf_hour_reversal_range["x"]):
-            self.__stats_hour_reversal["Range"]["% " + t.strftime('%H:%M')] = cpf_hour_reversal_range["cpf"][i]
-
     def __analyze_reversal_es_start_pivot(self):
         # filter days ES > PP or ES < PP at 8:30am
-        self.__es_higher_pp_start = self.__es_price_df[(self.__es_price_df['ES & PP'] == 1) | (self.__es_price_df['ES & PP'] == -1)]
-        self.__num_days_es_higher_pp_start = len(self.__es_higher_pp_start.index)
-        self.__es_lower_pp_start = self.__es_price_df[(self.__es_price_df['ES & PP'] == 0) | (self.__es_price_df['ES & PP'] == 2)]
-        self.__num_days_es_lower_pp_start = len(self.__es_lower_pp_start.index)
+        mask_es_higher_pp = self.__mask_es_higher_pp_start
+        mask_es_lower_pp = self.__mask_es_lower_pp_start
+        mask_reversal = self.__es_price_df['Hour trend change'].notna().to_numpy()
+        self.__num_days_es_higher_pp_start = int(np.count_nonzero(mask_es_higher_pp))
+        self.__num_days_es_lower_pp_start = int(np.count_nonzero(mask_es_lower_pp))
 
-        # filter for days with reversals
-        self.__es_higher_pp_start_then_reversal_df = self.__es_higher_pp_start[self.__es_higher_pp_start['Hour trend change'].notnull()]
-        self.__es_lower_pp_start_then_reversal_df = self.__es_lower_pp_start[self.__es_lower_pp_start['Hour trend change'].notnull()]
+        # days with reversals
+        self.__mask_es_higher_pp_start_then_reversal = mask_es_higher_pp & mask_reversal
+        self.__count_es_higher_pp_start_then_reversal = int(np.count_nonzero(self.__mask_es_higher_pp_start_then_reversal))
+        self.__mask_es_lower_pp_start_then_reversal = mask_es_lower_pp & mask_reversal
+        self.__count_es_lower_pp_start_then_reversal = int(np.count_nonzero(self.__mask_es_lower_pp_start_then_reversal))
 
-        self.__pct_es_higher_pp_start_then_reversal = 100. * len(self.__es_higher_pp_start_then_reversal_df.index) / self.__num_days_es_higher_pp_start
-        self.__pct_es_lower_pp_start_then_reversal = 100. * len(self.__es_lower_pp_start_then_reversal_df.index) / self.__num_days_es_lower_pp_start
+        self.__pct_es_higher_pp_start_then_reversal = 100. * self.__count_es_higher_pp_start_then_reversal / self.__num_days_es_higher_pp_start
+        self.__pct_es_lower_pp_start_then_reversal = 100. * self.__count_es_lower_pp_start_then_reversal / self.__num_days_es_lower_pp_start
 
     def __analyze_range(self):
         """
         Analyze range of each trend.
         """
-
-        # Trading range day
-        self.__stats_range_range["Range"][" "] = "range"
-        self.__stats_range_range["Range ES<PP"][" "] = "range ES<PP 8:30"
-        self.__stats_range_range["Range ES>PP"][" "] = "range ES>PP 8:30"
-        range_range_all_days = self.__es_range_df["Max Range 8:30 - 13"].values
-        range_range_es_lower_pp = self.__es_range_df[(self.__es_range_df["ES & PP"] == 1) | (self.__es_range_df["ES & PP"] == -1)]["Max Range 8:30 - 13"].values
-        range_range_es_higher_pp = self.__es_range_df[(self.__es_range_df["ES & PP"] == 0) | (self.__es_range_df["ES & PP"] == 2)]["Max Range 8:30 - 13"].values
-        range_cpf = self.__calc_cpf(range_range_all_days, int(max(range_range_all_days)), self.__BIN_RANGE_CPF)
-        range_es_lower_pp_cpf = self.__calc_cpf(range_range_es_lower_pp, int(max(range_range_all_days)), self.__BIN_RANGE_CPF)
-        range_es_higher_pp_cpf = self.__calc_cpf(range_range_es_higher_pp, int(max(range_range_all_days)), self.__BIN_RANGE_CPF)
-        for i, p in enumerate(range_cpf["x"]):
-            self.__stats_range_range["Range"]["% " + str(p) + "pt"] = range_cpf["cpf"][i]
-            self.__stats_range_range["Range ES<PP"]["% " + str(p) + "pt"] = range_es_lower_pp_cpf["cpf"][i]
-            self.__stats_range_range["Range ES>PP"]["% " + str(p) + "pt"] = range_es_higher_pp_cpf["cpf"][i]
-
-        # Uptrend day
-        self.__stats_range_uptrend["Uptrend"][" "] = "uptrend"
-        self.__stats_range_uptrend["Uptrend ES<PP"][" "] = "uptrend ES<PP 8:30"
-        self.__stats_range_uptrend["Uptrend ES>PP"][" "] = "uptrend ES>PP 8:30"
-        range_uptrend_all_days = self.__es_uptrend_df["Max Range 8:30 - 13"].values
-        range_uptrend_es_lower_pp = self.__es_uptrend_df[(self.__es_uptrend_df["ES & PP"] == 1) | (self.__es_uptrend_df["ES & PP"] == -1)][
-            "Max Range 8:30 - 13"].values
-        range_uptrend_es_higher_pp = self.__es_uptrend_df[(self.__es_uptrend_df["ES & PP"] == 0) | (self.__es_uptrend_df["ES & PP"] == 2)][
-            "Max Range 8:30 - 13"].values
-        uptrend_cpf = self.__calc_cpf(range_uptrend_all_days, int(max(range_uptrend_all_days)), self.__BIN_TREND_CPF)
-        uptrend_es_lower_pp_cpf = self.__calc_cpf(range_uptrend_es_lower_pp, int(max(range_uptrend_all_days)), self.__BIN_TREND_CPF)
-        uptrend_es_higher_pp_cpf = self.__calc_cpf(range_uptrend_es_higher_pp, int(max(range_uptrend_all_days)), self.__BIN_TREND_CPF)
-        for i, p in enumerate(uptrend_cpf["x"]):
-            self.__stats_range_uptrend["Uptrend"]["% " + str(p) + "pt"] = uptrend_cpf["cpf"][i]
-            self.__stats_range_uptrend["Uptrend ES<PP"]["% " + str(p) + "pt"] = uptrend_es_lower_pp_cpf["cpf"][i]
-            self.__stats_range_uptrend["Uptrend ES>PP"]["% " + str(p) + "pt"] = uptrend_es_higher_pp_cpf["cpf"][i]
-
-        # Downtrend day
-        self.__stats_range_downtrend["Downtrend"][" "] = "downtrend"
-        self.__stats_range_downtrend["Downtrend ES<PP"][" "] = "downtrend ES<PP 8:30"
-        self.__stats_range_downtrend["Downtrend ES>PP"][" "] = "downtrend ES>PP 8:30"
-        range_downtrend_all_days = self.__es_downtrend_df["Max Range 8:30 - 13"].values
-        range_downtrend_es_lower_pp = self.__es_downtrend_df[(self.__es_downtrend_df["ES & PP"] == 1) | (self.__es_downtrend_df["ES & PP"] == -1)][
-            "Max Range 8:30 - 13"].values
-        range_downtrend_es_higher_pp = self.__es_downtrend_df[(self.__es_downtrend_df["ES & PP"] == 0) | (self.__es_downtrend_df["ES & PP"] == 2)][
-            "Max Range 8:30 - 13"].values
-        downtrend_cpf = self.__calc_cpf(range_downtrend_all_days, int(max(range_downtrend_all_days)), self.__BIN_TREND_CPF)
-        downtrend_es_lower_pp_cpf = self.__calc_cpf(range_downtrend_es_lower_pp, int(max(range_downtrend_all_days)), self.__BIN_TREND_CPF)
-        downtrend_es_higher_pp_cpf = self.__calc_cpf(range_downtrend_es_higher_pp, int(max(range_downtrend_all_days)), self.__BIN_TREND_CPF)
-        for i, p in enumerate(downtrend_cpf["x"]):
-            self.__stats_range_downtrend["Downtrend"]["% " + str(p) + "pt"] = downtrend_cpf["cpf"][i]
-            self.__stats_range_downtrend["Downtrend ES<PP"]["% " + str(p) + "pt"] = downtrend_es_lower_pp_cpf["cpf"][i]
-            self.__stats_range_downtrend["Downtrend ES>PP"]["% " + str(p) + "pt"] = downtrend_es_higher_pp_cpf["cpf"][i]
+        # column array of the whole journal, sliced with the shared masks of each trend
+        max_range = self.__es_price_df["Max Range 8:30 - 13"].to_numpy()
+        mask_es_higher_pp = self.__mask_es_higher_pp_start
+        mask_es_lower_pp = self.__mask_es_lower_pp_start
+
+        # the three rows of each trend (all days, ES<PP and ES>PP at 8:30am) share the bins of all the days of the trend
+        for stats_range, key, mask_trend, bin_span in ((self.__stats_range_range, "Range", self.__mask_range, self.__BIN_RANGE_CPF),
+                                                       (self.__stats_range_uptrend, "Uptrend", self.__mask_uptrend, self.__BIN_TREND_CPF),
+                                                       (self.__stats_range_downtrend, "Downtrend", self.__mask_downtrend, self.__BIN_TREND_CPF)):
+            stats_range[key][" "] = key.lower()
+            stats_range[key + " ES<PP"][" "] = key.lower() + " ES<PP 8:30"
+            stats_range[key + " ES>PP"][" "] = key.lower() + " ES>PP 8:30"
+            range_all_days = max_range[mask_trend]
+            bin_max = int(np.nanmax(range_all_days))  # a day without range (blank cell) is not a bound
+            cpf_all_days = self.__calc_cpf(range_all_days, bin_max, bin_span)
+            cpf_es_lower_pp = self.__calc_cpf(max_range[mask_trend & mask_es_lower_pp], bin_max, bin_span)
+            cpf_es_higher_pp = self.__calc_cpf(max_range[mask_trend & mask_es_higher_pp], bin_max, bin_span)
+            labels = ["% " + str(p) + "pt" for p in cpf_all_days["x"]]
+            stats_range[key].update(zip(labels, cpf_all_days["cpf"]))
+            stats_range[key + " ES<PP"].update(zip(labels, cpf_es_lower_pp["cpf"]))
+            stats_range[key + " ES>PP"].update(zip(labels, cpf_es_higher_pp["cpf"]))
 
     def __analyze_no_rebound(self):
 
-        no_rebounds_df = self.__es_price_df[self.__es_price_df[self.__KEY_PT_DEEP_REBOUND].isnull() & self.__es_price_df[
-            self.__KEY_NO_PERFECT_REBOUND].notnull()]
-        no_rebounds_pivot_df = no_rebounds_df[no_rebounds_df["No perfect rebound"] =="PP"]
-        no_rebounds_support_df = no_rebounds_df[no_rebounds_df["No perfect rebound"] == "S"]
-        no_rebounds_resistance_df = no_rebounds_df[no_rebounds_df["No perfect rebound"] == "R"]
-
-        cpf_hour_no_rebound_pivot = self.__calc_cpf_time(no_rebounds_pivot_df["Time cross"].values)
-        cpf_hour_no_rebound_support = self.__calc_cpf_time(no_rebounds_support_df["Time cross"].values)
-        cpf_hour_no_rebound_resistance = self.__calc_cpf_time(no_rebounds_resistance_df["Time cross"].values)
-
-        self.__time_stats_no_rebound["Pivot"][" "] = "pivot"
-        self.__time_stats_no_rebound["Support"][" "] = "support"
-        self.__time_stats_no_rebound["Resistance"][" "] = "resistance"
-        for i, t in enumerate(cpf_hour_no_rebound_pivot["x"]):
-            self.__time_stats_no_rebound["Pivot"]["% " + t.strftime('%H:%M')] = cpf_hour_no_rebound_pivot["cpf"][i]
-            self.__time_stats_no_rebound["Support"]["% " + t.strftime('%H:%M')] = cpf_hour_no_rebound_support["cpf"][i]
-            self.__time_stats_no_rebound["Resistance"]["% " + t.strftime('%H:%M')] = cpf_hour_no_rebound_resistance["cpf"][i]
-
-        cpf_body_no_rebound_pivot = self.__calc_cpf(no_rebounds_pivot_df[no_rebounds_pivot_df["Body candle"] > 0]["Body candle"].values.astype(int),
-                                                                                              int(max(no_rebounds_df["Body "
-                                                                                                                                "candle"].values)), 5)
-        cpf_body_no_rebound_support = self.__calc_cpf(no_rebounds_support_df[no_rebounds_support_df["Body candle"] > 0]["Body candle"].values.astype(
-            int), int(max(no_rebounds_df["Body "
-                                                                                                                                       "candle"].values)), 5)
-        cpf_body_no_rebound_resistance = self.__calc_cpf(no_rebounds_resistance_df[no_rebounds_resistance_df["Body candle"] > 0]["Body "
-                                                                                                                          "candle"].values.astype(int), int(max(no_rebounds_df["Body "
-                                                                                                                                             "candle"].values)), 5)
-        self.__body_stats_no_rebound["Pivot"][" "] = "pivot"
-        self.__body_stats_no_rebound["Support"][" "] = "support"
-        self.__body_stats_no_rebound["Resistance"][" "] = "resistance"
-        for i, t in enumerate(cpf_body_no_rebound_resistance["x"]):
-            self.__body_stats_no_rebound["Pivot"]["% " + str(t) + "pt"] = cpf_body_no_rebound_pivot["cpf"][i]
-            self.__body_stats_no_rebound["Support"]["% " + str(t) + "pt"] = cpf_body_no_rebound_support["cpf"][i]
-            self.__body_stats_no_rebound["Resistance"]["% " + str(t)+"pt"] = cpf_body_no_rebound_resistance["cpf"][i]
+        mask_no_rebound = self.__es_price_df[self.__KEY_PT_DEEP_REBOUND].isna() & self.__es_price_df[self.__KEY_NO_PERFECT_REBOUND].notna()
+        no_rebounds_df = self.__es_price_df.loc[mask_no_rebound, [self.__KEY_NO_PERFECT_REBOUND, "Time cross", "Body candle"]]
+        # split the days without rebound by Demark point in a single pass
+        no_rebounds_point_df = dict(list(no_rebounds_df.groupby(self.__KEY_NO_PERFECT_REBOUND, observed=True, sort=False)))
+        bin_max_body = int(np.nanmax(no_rebounds_df["Body candle"].to_numpy()))
+
+        for key, point, name in (("Pivot", "PP", "pivot"), ("Support", "S", "support"), ("Resistance", "R", "resistance")):
+            no_rebounds_df_point = no_rebounds_point_df.get(point, no_rebounds_df.iloc[:0])
+
+            cpf_hour_no_rebound = self.__calc_cpf_time(no_rebounds_df_point["Time cross"].to_numpy())
+            self.__time_stats_no_rebound[key][" "] = name
+            self.__time_stats_no_rebound[key].update(zip(self.__labels_cpf_time, cpf_hour_no_rebound["cpf"]))
+
+            body_candle = no_rebounds_df_point["Body candle"].to_numpy()
+            cpf_body_no_rebound = self.__calc_cpf(body_candle[body_candle > 0].astype(int), bin_max_body, 5)
+            labels_body = ["% " + str(t) + "pt" for t in cpf_body_no_rebound["x"]]
+            self.__body_stats_no_rebound[key][" "] = name
+            self.__body_stats_no_rebound[key].update(zip(labels_body, cpf_body_no_rebound["cpf"]))
 
         # TO DO:
         # stats PP: pct each pattern
@@ -615,300 +567,262 @@ class EsPriceAnalysis:
         """
 
         try:
-            with open(os.path.expanduser(self.__PATH_FINAL_REPORT), 'w') as fo:
-                fo.write("<html>\n<head>\n<title> \nOutput Data in an HTML file \
+            # the report is collected in memory and written to the file at once
+            html = []
+            html.append("<html>\n<head>\n<title> \nOutput Data in an HTML file \
                           </title>\n</head> <body><h1><center>" + "ES price data from 8:30am to 3pm </center></h1>\n</body></html>")
-                fo.write('<br/>')
-                fo.write("<br/>Period: " + self._EsPriceAnalysis__es_price_df["Date"].iloc[0].strftime('%d/%m/%Y') + " to "
-                         + self._EsPriceAnalysis__es_price_df["Date"].iloc[-1].strftime('%d/%m/%Y'))
-                fo.write('<br/><br/>')
-
-                # ================================ Analysis of reversals =================================
-                fo.write("<center><b>Reversals (8:30am to 3pm)</b></center>")
-                fo.write("<br/>Days with trend reversal: " + str(self.__round(self.__stats_reversal["General"]["pct with reversal"])) + "%")
-                fo.write("<br/>")
-
-                # pct days with a reversal in the morning
-                days_reversal_df = pd.DataFrame([self.__stats_reversal["reversal day"]])
-                days_reversal_df.set_index(" ", inplace=True)
-                days_reversal_df.index.name = None
-                fo.write(days_reversal_df.to_html().replace('<td>', '<td align="center">'))
-                fo.write("*Trend to range are not showed in the table.<br/>")
-                fo.write("<br/>")
-
-                # range and ES vs. PP at 8:30am analysis
-                fo.write("<br/>Analysis of range and ES vs. PP at 8:30am when a reversal occurs.")
-                trend_days_reversal_df = pd.DataFrame([self.__stats_reversal["uptrend day"],
-                                                       self.__stats_reversal["downtrend day"],
-                                                       self.__stats_reversal["range day"]])
-                trend_days_reversal_df.set_index(" ", inplace=True)
-                trend_days_reversal_df.index.name = None
-                fo.write(trend_days_reversal_df.to_html().replace('<td>', '<td align="center">'))
-                fo.write("*% calculated against the number of days with that trend type.<br/>")
-                fo.write("**% calculated against the number of days with a reversal.<br/>")
-                fo.write("<br/>")
-
-                # cumulative probability of reversal hours
-                fo.write("<br/>Analysis of the cumulative probability of the time of the reversal.")
-                trend_days_hour_reversal_df = pd.DataFrame([self.__stats_hour_reversal["General"],
-                                                            self.__stats_hour_reversal["Uptrend"],
-                                                            self.__stats_hour_reversal["Downtrend"],
-                                                            self.__stats_hour_reversal["Range"]])
-                trend_days_hour_reversal_df.set_index(" ", inplace=True)
-                trend_days_hour_reversal_df.index.name = None
-                fo.write(trend_days_hour_reversal_df.to_html().replace('<td>', '<td align="center">'))
-                fo.write("<br/>")
-
-                fo.write("<br/>Analysis of the trading range with reversal.")
-                trend_reversal_df = pd.DataFrame([self.__range_then_reversal])
-                trend_reversal_df.set_index(" ", inplace=True)
-                trend_reversal_df.index.name = None
-                fo.write(trend_reversal_df.to_html().replace('<td>', '<td align="center">'))
-                fo.write("<br/>")
-
-                # ======================================= Demark pivot points analysis ======================================
-                fo.write('<br/><br/><br/>')
-                fo.write("<center><b>Demark points (8:30am to 1pm)</b></center>")
-                fo.write("<br/>Definitions:")
-                fo.write("<br/><u>Perfect rebound</u>: ES hits the Demark point +/-2pt and bounces from it of at least 4pts (Mastering take profit)")
-                fo.write("<br/><u>Deep rebound</u>: ES crosses the Demark point more than 2pt ")
-                fo.write("and reverts towards the point within maximum 15.75pt from the cross.")
-                fo.write("<br/>     ES then crosses again the point of at least 4pt (take profit)")
-                fo.write("<br/><u>Rebound</u>: ES hits or crosses the Demark point of no more than 15.75pt ")
-                fo.write("and bounce back of more than 4pt from the point.")
-                fo.write("<br/><u>Failed rebound</u>: ES crosses the Demark point of more than 16pt without a 4pt bounce.")
-                fo.write('<br/><br/>')
-                fo.write("<br/>Frequency of Demark pivot points:")
-                frequency_point_df = pd.DataFrame([{
-                    " ": str(self.__stats_pivot_points["General"]["count points"]) + " crossed Demark points",
-                    "% resistance": self.__stats_pivot_points["Resistance"]["pct point"],
-                    "% pivot": self.__stats_pivot_points["Pivot"]["pct point"],
-                    "% support": self.__stats_pivot_points["Support"]["pct point"]
-                }])
-                frequency_point_df.set_index(" ", inplace=True)
-                frequency_point_df.index.name = None
-                fo.write(frequency_point_df.to_html().replace('<td>', '<td align="center">'))
-                fo.write("<br/>")
-                # each dictionary is a row of the pandas dataframe (and therefore of the html table)
-                # the dictionaries must have the same keys, which are the html table column names
-                days_df = pd.DataFrame([{
-                    " ": str(self.__stats_pivot_points["General"]["total days"]) + " days",
-                    "% days with Demark": self.__stats_pivot_points["General"]["pct days with demark"],
-                    "% days without Demark": self.__stats_pivot_points["General"]["pct days no demark"],
-                    "% days with a rebound*": self.__stats_pivot_points["General"]["pct days with rebound"],
-                }])
-                days_df.set_index(" ", inplace=True)
-                days_df.index.name = None
-                fo.write(days_df.to_html().replace('<td>', '<td align="center">'))
-                fo.write("*Percentage against the total number of days analyzed.")
-
-                fo.write('<br/><br/>')
-                fo.write("<br/>Days with at least one Demark point crossed:")
-                days_with_demark_df = pd.DataFrame([{
-                    " ": str(self.__stats_pivot_points["Days with demark"]["count"]) + " days with Demark points",
-                    "% with at least 1 rebound": self.__stats_pivot_points["Days with demark"]["with rebound"],
-                    "% with at least 1 perfect rebound": self.__stats_pivot_points["Days with demark"]["with perfect rebound"],
-                    "% with at least 1 deep rebound": self.__stats_pivot_points["Days with demark"]["with deep rebound"],
-                    "% with at least 1 rebound without failed rebound": self.__stats_pivot_points["Days with demark"][
-                        "only rebound"],
-                    "% with at least 1 perfect rebound without failed rebound": self.__stats_pivot_points["Days with demark"]["only perfect rebound"],
-                    "% with at least 1 deep rebound without failed rebound": self.__stats_pivot_points["Days with demark"]["only deep rebound"],
-                    "% with 1 failed rebound": self.__stats_pivot_points["Days with demark"]["with no rebound"],
-                    "% with 1 failed rebound and without rebounds": self.__stats_pivot_points["Days with demark"]["only no rebound"]
-                }])
-                days_with_demark_df.set_index(" ", inplace=True)
-                days_with_demark_df.index.name = None
-                fo.write(days_with_demark_df.to_html().replace('<td>', '<td align="center">'))
-
-                fo.write('<br/><br/>')
-                fo.write("<br/>Probability of a rebound (4/16pt win) when approaching a Demark point:")
-                # each dictionary is a row of the pandas dataframe (and therefore of the html table)
-                # the dictionaries must have the same keys, which are the html table column names
-                dict_demark_point = {
-                    " ": "any Demark",
-                    "% rebound": self.__stats_pivot_points["General"]["pct rebound"],
-                    "% perfect rebound": self.__stats_pivot_points["General"]["pct perfect rebound"],
-                    "% deep rebound": self.__stats_pivot_points["General"]["pct deep rebound"],
-                    "% no rebound": self.__stats_pivot_points["General"]["pct no rebound"]
-                }
-                dict_pivot = {
-                    " ": "pivot",
-                    "% rebound": self.__stats_pivot_points["Pivot"]["pct rebound"],
-                    "% perfect rebound": self.__stats_pivot_points["Pivot"]["pct perfect rebound"],
-                    "% deep rebound": self.__stats_pivot_points["Pivot"]["pct deep rebound"],
-                    "% no rebound": self.__stats_pivot_points["Pivot"]["pct no rebound"]
-                }
-                dict_support = {
-                    " ": "support",
-                    "% rebound": self.__stats_pivot_points["Support"]["pct rebound"],
-                    "% perfect rebound": self.__stats_pivot_points["Support"]["pct perfect rebound"],
-                    "% deep rebound": self.__stats_pivot_points["Support"]["pct deep rebound"],
-                    "% no rebound": self.__stats_pivot_points["Support"]["pct no rebound"]
-                }
-                dict_resistance = {
-                    " ": "resistance",
-                    "% rebound": self.__stats_pivot_points["Resistance"]["pct rebound"],
-                    "% perfect rebound": self.__stats_pivot_points["Resistance"]["pct perfect rebound"],
-                    "% deep rebound": self.__stats_pivot_points["Resistance"]["pct deep rebound"],
-                    "% no rebound": self.__stats_pivot_points["Resistance"]["pct no rebound"]
-                }
-                point_type_df = pd.DataFrame([dict_resistance,
-                                              dict_pivot,
-                                              dict_support,
-                                              dict_demark_point])
-                point_type_df.set_index(" ", inplace=True)
-                point_type_df.index.name = None
-                fo.write(point_type_df.to_html().replace('<td>', '<td align="center">'))
-
-                fo.write('<br/><br/>')
-                fo.write("<br/>Cumulative probability of deep rebound points when approaching a Demark point:")
-                deep_type_df = pd.DataFrame([self.__stats_deep_rebound["General"],
-                                             self.__stats_deep_rebound["Resistance"],
-                                             self.__stats_deep_rebound["Pivot"],
-                                             self.__stats_deep_rebound["Support"]])
-                deep_type_df.set_index(" ", inplace=True)
-                deep_type_df.index.name = None
-                fo.write(deep_type_df.to_html().replace('<td>', '<td align="center">'))
-
-                # fo.write('<br/><br/>')
-                # fo.write("<br/>Probability of not bouncing when approaching a Demark point:")
-                # trend_no_rebound_df = pd.DataFrame([self.__stats_no_rebound["Range"]])
-                # trend_no_rebound_df.set_index(" ", inplace=True)
-                # trend_no_rebound_df.index.name = None
-                # fo.write(trend_no_rebound_df.to_html().replace('<td>', '<td align="center">'))
-
-                # es_pp_no_rebound_df = pd.DataFrame([self.__stats_no_rebound["ES PP"]])
-                # es_pp_no_rebound_df.set_index(" ", inplace=True)
-                # es_pp_no_rebound_df.index.name = None
-                # fo.write(es_pp_no_rebound_df.to_html().replace('<td>', '<td align="center">'))
-
-                # point_no_rebound_df = pd.DataFrame([self.__stats_no_rebound["Point"]])
-                # point_no_rebound_df.set_index(" ", inplace=True)
-                # point_no_rebound_df.index.name = None
-                # fo.write(point_no_rebound_df.to_html().replace('<td>', '<td align="center">'))
-                # fo.write("<br/>")
-
-                # ======================================= Range analysis ======================================
-                fo.write('<br/><br/><br/>')
-                fo.write("<center><b>Range analysis</b></center>")
-                fo.write("<br/>Cumulative probability of the maximum range if trading range day.")
-                range_range_df = pd.DataFrame([self.__stats_range_range["Range"],
-                                               self.__stats_range_range["Range ES<PP"],
-                                               self.__stats_range_range["Range ES>PP"]])
-                range_range_df.set_index(" ", inplace=True)
-                range_range_df.index.name = None
-                fo.write(range_range_df.to_html().replace('<td>', '<td align="center">'))
-                fo.write("<br/>Cumulative probability of the maximum range if uptrend day.")
-                range_uptrend_df = pd.DataFrame([self.__stats_range_uptrend["Uptrend"],
-                                                 self.__stats_range_uptrend["Uptrend ES<PP"],
-                                                 self.__stats_range_uptrend["Uptrend ES>PP"]])
-                range_uptrend_df.set_index(" ", inplace=True)
-                range_uptrend_df.index.name = None
-                fo.write(range_uptrend_df.to_html().replace('<td>', '<td align="center">'))
-                fo.write("<br/>Cumulative probability of the maximum range if downtrend day.")
-                range_downtrend_df = pd.DataFrame([self.__stats_range_downtrend["Downtrend"],
-                                                   self.__stats_range_downtrend["Downtrend ES<PP"],
-                                                   self.__stats_range_downtrend["Downtrend ES>PP"]])
-                range_downtrend_df.set_index(" ", inplace=True)
-                range_downtrend_df.index.name = None
-                fo.write(range_downtrend_df.to_html().replace('<td>', '<td align="center">'))
-                fo.write("<br/>")
-
-                # OLD
-                dict_rebound = {
-                    " ": "rebound",
-                    "pivot [%]": self.__stats_pivot_points["Pivot"]["pct pivot rebound"],
-                    "support [%]": self.__stats_pivot_points["Support"]["pct support rebound"],
-                    "resistance [%]": self.__stats_pivot_points["Resistance"]["pct resistance rebound"]
-                }
-                dict_perfect_rebound = {
-                    " ": "perfect rebound",
-                    "pivot [%]": self.__stats_pivot_points["Pivot"]["pct pivot perfect rebound"],
-                    "support [%]": self.__stats_pivot_points["Support"]["pct support perfect rebound"],
-                    "resistance [%]": self.__stats_pivot_points["Resistance"]["pct resistance perfect rebound"]
-                }
-                dict_deep_rebound = {
-                    " ": "deep rebound",
-                    "pivot [%]": self.__stats_pivot_points["Pivot"]["pct pivot deep rebound"],
-                    "support [%]": self.__stats_pivot_points["Support"]["pct support deep rebound"],
-                    "resistance [%]": self.__stats_pivot_points["Resistance"]["pct resistance deep rebound"]
-                }
-                dict_no_rebound = {
-                    " ": "no rebound",
-                    "pivot [%]": self.__stats_pivot_points["Pivot"]["pct pivot no rebound"],
-                    "support [%]": self.__stats_pivot_points["Support"]["pct support no rebound"],
-                    "resistance [%]": self.__stats_pivot_points["Resistance"]["pct resistance no rebound"]
-                }
-                rebound_type_df = pd.DataFrame([dict_rebound,
-                                                dict_perfect_rebound,
-                                                dict_deep_rebound,
-                                                dict_no_rebound])
-                rebound_type_df.set_index(" ", inplace=True)
-                rebound_type_df.index.name = None
-
-                # =========================== No rebound analysis ========================
-
-                no_rebound_time_analysis_df = pd.DataFrame([self.__time_stats_no_rebound["Pivot"],
-                                                            self.__time_stats_no_rebound["Support"],
-                                                            self.__time_stats_no_rebound["Resistance"]
-                                                            ])
-                no_rebound_time_analysis_df.set_index(" ", inplace=True)
-                no_rebound_time_analysis_df.index.name = None
-                fo.write(no_rebound_time_analysis_df.to_html().replace('<td>', '<td align="center">'))
-
-                fo.write("<br/>")
-                no_rebound_body_analysis_df = pd.DataFrame([self.__body_stats_no_rebound["Pivot"],
-                                                            self.__body_stats_no_rebound["Support"],
-                                                            self.__body_stats_no_rebound["Resistance"]
-                                                            ])
-                no_rebound_body_analysis_df.set_index(" ", inplace=True)
-                no_rebound_body_analysis_df.index.name = None
-                fo.write(no_rebound_body_analysis_df.to_html().replace('<td>', '<td align="center">'))
+            html.append('<br/>')
+            html.append("<br/>Period: " + self._EsPriceAnalysis__es_price_df["Date"].iloc[0].strftime('%d/%m/%Y') + " to "
+                        + self._EsPriceAnalysis__es_price_df["Date"].iloc[-1].strftime('%d/%m/%Y'))
+            html.append('<br/><br/>')
+
+            # ================================ Analysis of reversals =================================
+            html.append("<center><b>Reversals (8:30am to 3pm)</b></center>")
+            html.append("<br/>Days with trend reversal: " + str(self.__round(self.__stats_reversal["General"]["pct with reversal"])) + "%")
+            html.append("<br/>")
+
+            # pct days with a reversal in the morning
+            html.append(self.__html_table([self.__stats_reversal["reversal day"]]))
+            html.append("*Trend to range are not showed in the table.<br/>")
+            html.append("<br/>")
+
+            # range and ES vs. PP at 8:30am analysis
+            html.append("<br/>Analysis of range and ES vs. PP at 8:30am when a reversal occurs.")
+            html.append(self.__html_table([self.__stats_reversal["uptrend day"],
+                                           self.__stats_reversal["downtrend day"],
+                                           self.__stats_reversal["range day"]]))
+            html.append("*% calculated against the number of days with that trend type.<br/>")
+            html.append("**% calculated against the number of days with a reversal.<br/>")
+            html.append("<br/>")
+
+            # cumulative probability of reversal hours
+            html.append("<br/>Analysis of the cumulative probability of the time of the reversal.")
+            html.append(self.__html_table([self.__stats_hour_reversal["General"],
+                                           self.__stats_hour_reversal["Uptrend"],
+                                           self.__stats_hour_reversal["Downtrend"],
+                                           self.__stats_hour_reversal["Range"]]))
+            html.append("<br/>")
+
+            html.append("<br/>Analysis of the trading range with reversal.")
+            html.append(self.__html_table([self.__range_then_reversal]))
+            html.append("<br/>")
+
+            # ======================================= Demark pivot points analysis ======================================
+            html.append('<br/><br/><br/>')
+            html.append("<center><b>Demark points (8:30am to 1pm)</b></center>")
+            html.append("<br/>Definitions:")
+            html.append("<br/><u>Perfect rebound</u>: ES hits the Demark point +/-2pt and bounces from it of at least 4pts (Mastering take profit)")
+            html.append("<br/><u>Deep rebound</u>: ES crosses the Demark point more than 2pt ")
+            html.append("and reverts towards the point within maximum 15.75pt from the cross.")
+            html.append("<br/>     ES then crosses again the point of at least 4pt (take profit)")
+            html.append("<br/><u>Rebound</u>: ES hits or crosses the Demark point of no more than 15.75pt ")
+            html.append("and bounce back of more than 4pt from the point.")
+            html.append("<br/><u>Failed rebound</u>: ES crosses the Demark point of more than 16pt without a 4pt bounce.")
+            html.append('<br/><br/>')
+            html.append("<br/>Frequency of Demark pivot points:")
+            html.append(self.__html_table([{
+                " ": str(self.__stats_pivot_points["General"]["count points"]) + " crossed Demark points",
+                "% resistance": self.__stats_pivot_points["Resistance"]["pct point"],
+                "% pivot": self.__stats_pivot_points["Pivot"]["pct point"],
+                "% support": self.__stats_pivot_points["Support"]["pct point"]
+            }]))
+            html.append("<br/>")
+            # the dictionary is the row of the html table: its keys are the html table column names
+            html.append(self.__html_table([{
+                " ": str(self.__stats_pivot_points["General"]["total days"]) + " days",
+                "% days with Demark": self.__stats_pivot_points["General"]["pct days with demark"],
+                "% days without Demark": self.__stats_pivot_points["General"]["pct days no demark"],
+                "% days with a rebound*": self.__stats_pivot_points["General"]["pct days with rebound"],
+            }]))
+            html.append("*Percentage against the total number of days analyzed.")
+
+            html.append('<br/><br/>')
+            html.append("<br/>Days with at least one Demark point crossed:")
+            html.append(self.__html_table([{
+                " ": str(self.__stats_pivot_points["Days with demark"]["count"]) + " days with Demark points",
+                "% with at least 1 rebound": self.__stats_pivot_points["Days with demark"]["with rebound"],
+                "% with at least 1 perfect rebound": self.__stats_pivot_points["Days with demark"]["with perfect rebound"],
+                "% with at least 1 deep rebound": self.__stats_pivot_points["Days with demark"]["with deep rebound"],
+                "% with at least 1 rebound without failed rebound": self.__stats_pivot_points["Days with demark"][
+                    "only rebound"],
+                "% with at least 1 perfect rebound without failed rebound": self.__stats_pivot_points["Days with demark"]["only perfect rebound"],
+                "% with at least 1 deep rebound without failed rebound": self.__stats_pivot_points["Days with demark"]["only deep rebound"],
+                "% with 1 failed rebound": self.__stats_pivot_points["Days with demark"]["with no rebound"],
+                "% with 1 failed rebound and without rebounds": self.__stats_pivot_points["Days with demark"]["only no rebound"]
+            }]))
+
+            html.append('<br/><br/>')
+            html.append("<br/>Probability of a rebound (4/16pt win) when approaching a Demark point:")
+            # each dictionary is a row of the html table
+            # the dictionaries must have the same keys, which are the html table column names
+            columns_point_type = {"% rebound": "pct rebound",
+                                  "% perfect rebound": "pct perfect rebound",
+                                  "% deep rebound": "pct deep rebound",
+                                  "% no rebound": "pct no rebound"}
+            html.append(self.__html_table(
+                [{" ": name, **{column: self.__stats_pivot_points[key][stat] for column, stat in columns_point_type.items()}}
+                 for key, name in (("Resistance", "resistance"), ("Pivot", "pivot"), ("Support", "support"), ("General", "any Demark"))]))
+
+            html.append('<br/><br/>')
+            html.append("<br/>Cumulative probability of deep rebound points when approaching a Demark point:")
+            html.append(self.__html_table([self.__stats_deep_rebound["General"],
+                                           self.__stats_deep_rebound["Resistance"],
+                                           self.__stats_deep_rebound["Pivot"],
+                                           self.__stats_deep_rebound["Support"]]))
+
+            # html.append('<br/><br/>')
+            # html.append("<br/>Probability of not bouncing when approaching a Demark point:")
+            # trend_no_rebound_df = pd.DataFrame([self.__stats_no_rebound["Range"]])
+            # trend_no_rebound_df.set_index(" ", inplace=True)
+            # trend_no_rebound_df.index.name = None
+            # html.append(trend_no_rebound_df.to_html().replace('<td>', '<td align="center">'))
+
+            # es_pp_no_rebound_df = pd.DataFrame([self.__stats_no_rebound["ES PP"]])
+            # es_pp_no_rebound_df.set_index(" ", inplace=True)
+            # es_pp_no_rebound_df.index.name = None
+            # html.append(es_pp_no_rebound_df.to_html().replace('<td>', '<td align="center">'))
+
+            # point_no_rebound_df = pd.DataFrame([self.__stats_no_rebound["Point"]])
+            # point_no_rebound_df.set_index(" ", inplace=True)
+            # point_no_rebound_df.index.name = None
+            # html.append(point_no_rebound_df.to_html().replace('<td>', '<td align="center">'))
+            # html.append("<br/>")
+
+            # ======================================= Range analysis ======================================
+            html.append('<br/><br/><br/>')
+            html.append("<center><b>Range analysis</b></center>")
+            html.append("<br/>Cumulative probability of the maximum range if trading range day.")
+            html.append(self.__html_table([self.__stats_range_range["Range"],
+                                           self.__stats_range_range["Range ES<PP"],
+                                           self.__stats_range_range["Range ES>PP"]]))
+            html.append("<br/>Cumulative probability of the maximum range if uptrend day.")
+            html.append(self.__html_table([self.__stats_range_uptrend["Uptrend"],
+                                           self.__stats_range_uptrend["Uptrend ES<PP"],
+                                           self.__stats_range_uptrend["Uptrend ES>PP"]]))
+            html.append("<br/>Cumulative probability of the maximum range if downtrend day.")
+            html.append(self.__html_table([self.__stats_range_downtrend["Downtrend"],
+                                           self.__stats_range_downtrend["Downtrend ES<PP"],
+                                           self.__stats_range_downtrend["Downtrend ES>PP"]]))
+            html.append("<br/>")
+
+            # =========================== No rebound analysis ========================
+
+            html.append(self.__html_table([self.__time_stats_no_rebound["Pivot"],
+                                           self.__time_stats_no_rebound["Support"],
+                                           self.__time_stats_no_rebound["Resistance"]]))
+
+            html.append("<br/>")
+            html.append(self.__html_table([self.__body_stats_no_rebound["Pivot"],
+                                           self.__body_stats_no_rebound["Support"],
+                                           self.__body_stats_no_rebound["Resistance"]]))
 
+            with open(os.path.expanduser(self.__PATH_FINAL_REPORT), 'w') as fo:
+                fo.write("".join(html))
 
         except Exception as e:
             print('Cannot create the html file:', e)
             sys.exit(1)  # stop the main function with exit code 1
 
+    @staticmethod
+    def __html_column(values: list) -> list:
+        """
+        Format the values of a column of a report table as pandas to_html does: the floats go through
+        pd.options.display.float_format when it is set, otherwise the floats of a column share the same decimals.
+        """
+        if not any(isinstance(value, (float, np.floating)) for value in values):
+            return [escape(str(value), quote=False) for value in values]
+        values = np.asarray(values, dtype=np.float64)  # like pandas, a column with a float is a float column
+        float_format = pd.get_option("display.float_format")
+        if float_format is not None:
+            return ["NaN" if np.isnan(value) else escape(float_format(value), quote=False) for value in values]
+        values_str = ["NaN" if np.isnan(value) else "%.6f" % value for value in values]
+        # trim the trailing zeros common to all the numbers, then leave at least one decimal
+        while any(x != "NaN" for x in values_str) and all(x.endswith("0") for x in values_str if x != "NaN"):
+            values_str = [x if x == "NaN" else x[:-1] for x in values_str]
+        return [x + "0" if x.endswith(".") else x for x in values_str]
+
+    @staticmethod
+    def __html_table(rows: list) -> str:
+        """
+        Write a list of rows as an html table: the value of the key " " is the row name, the other keys are the column names.
+        """
+        columns = list(dict.fromkeys(key for row in rows for key in row if key != " "))
+        cells = [EsPriceAnalysis.__html_column([row.get(column, np.nan) for row in rows]) for column in columns]
+        html = ['<table border="1" class="dataframe">\n  <thead>\n    <tr style="text-align: right;">\n      <th></th>\n']
+        html += ['      <th>' + escape(column, quote=False) + '</th>\n' for column in columns]
+        html.append('    </tr>\n  </thead>\n  <tbody>\n')
+        for i, row in enumerate(rows):
+            html.append('    <tr>\n      <th>' + escape(str(row[" "]), quote=False) + '</th>\n')
+            html += ['      <td align="center">' + cells_column[i] + '</td>\n' for cells_column in cells]
+            html.append('    </tr>\n')
+        html.append('  </tbody>\n</table>')
+        return "".join(html)
+
+    @staticmethod
+    def __es_pp_masks(es_pp: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Masks of the days with ES higher (1 or -1) and lower (0 or 2) than PP at 8:30am.
+        """
+        # ES & PP holds -1, 0, 1 and 2: shifted by one, it indexes a lookup table of each class.
+        # A blank day (NaN) or any other value indexes the last entry of the tables, which is in neither class
+        es_pp = np.asarray(es_pp, dtype=np.float64)
+        mask_es_pp_known = (es_pp >= -1) & (es_pp <= 2) & (es_pp == np.trunc(es_pp))
+        index_es_pp = np.where(mask_es_pp_known, es_pp + 1, 4).astype(np.intp)
+        mask_es_higher_pp = np.array([True, False, True, False, False])[index_es_pp]
+        mask_es_lower_pp = np.array([False, True, False, True, False])[index_es_pp]
+        return mask_es_higher_pp, mask_es_lower_pp
+
     @staticmethod
     def __calc_cpf(data: list, bin_max: int, bin_span: int = 2) -> dict:
         """Calculate the cumulative probability function."""
 
-        cpf = []
-        x_cpf = [p for p in range(bin_span, bin_max, bin_span)] + [bin_max]
-        n = float(len(data))
-        for x in x_cpf:
-            cpf.append(100. * sum(i <= x for i in data) / n)
-        return {"cpf": cpf, "x": x_cpf}
+        x_cpf = EsPriceAnalysis.__bin_edges(bin_max, bin_span)
+        cpf = EsPriceAnalysis.__cpf_sorted(np.sort(np.asarray(data, dtype=np.float64)), x_cpf)
+        return {"cpf": cpf, "x": list(x_cpf)}
 
-    def __calc_cpf_time(self, data: list) -> dict:
+    @staticmethod
+    @functools.lru_cache(maxsize=32)
+    def __bin_edges(bin_max: int, bin_span: int) -> tuple:
+        """Bin edges of the cumulative probability function, cached: the same few (bin_max, bin_span) are used in every report."""
+        return tuple(range(bin_span, bin_max, bin_span)) + (bin_max,)
+
+    @staticmethod
+    def __cpf_sorted(data_sorted: np.ndarray, x_cpf) -> np.ndarray:
+        """Cumulative probability [%] of the sorted data at each value of x_cpf."""
+
+        # the number of values <= x is the insertion index of x (from the right) in the sorted data
+        return 100. * np.searchsorted(data_sorted, x_cpf, side='right') / float(len(data_sorted))
+
+    @staticmethod
+    def __seconds_of_day(t: datetime.time) -> float:
+        """Convert a time of the day into seconds since midnight."""
+        return t.hour * 3600 + t.minute * 60 + t.second + t.microsecond / 1e6
+
+    def __calc_cpf_time(self, data: list, is_sorted: bool = False) -> dict:
         """Calculate the cumulative probability function."""
 
-        cpf = []
-        n = float(len(data))
-        for x in self.__x_cpf_time:
-            cpf.append(100. * sum(i <= x for i in data) / n)
+        # same as __calc_cpf on the times of the day, given in seconds since midnight
+        seconds = np.asarray(data, dtype=np.float64)
+        cpf = self.__cpf_sorted(seconds if is_sorted else np.sort(seconds), self.__x_cpf_time_seconds)
         return {"cpf": cpf, "x": self.__x_cpf_time}
 
-    def __make_plot_monthly_change(self) -> tuple[go.Figure, list]:
+    def __make_plot_monthly_change(self) -> tuple["go.Figure", list]:
         """
         Make the bar plot of the monthly change of the asset.
+        Needs plotly and scipy (for the confidence interval): they are not used by the report and are imported only here.
         :return: plotly figure
         :rtype: Figure
         :return: list of negative statistics
         :rtype: list
         """
+        import plotly.graph_objects as go
 
-        month_positive = {"day num": [], "change": []}
-        month_negative = {"day num": [], "change": []}
-
-        for idx, change in enumerate(self.__change_list_monthly_dte_for_plot_df["change_list"]):
-            if change > 0:
-                month_positive["change"].append(change)
-                month_positive["day num"].append(idx)
-            else:
-                month_negative["change"].append(change)
-                month_negative["day num"].append(idx)
+        # split the days with positive and negative (or zero) change
+        change = np.asarray(self.__change_list_monthly_dte_for_plot_df["change_list"], dtype=np.float64)
+        day_num = np.arange(change.size)
+        mask_positive = change > 0
+        month_positive = {"day num": day_num[mask_positive], "change": change[mask_positive]}
+        month_negative = {"day num": day_num[~mask_positive], "change": change[~mask_positive]}
 
         # Make bar plot
         fig = go.Figure(data=[
@@ -932,15 +846,22 @@ class EsPriceAnalysis:
                    )
         ])
 
-        # calculate statistics for negative change
-        confidence_interval = self.__mean_confidence_interval(month_negative["change"])
+        # calculate statistics for negative change: mean and 95% confidence interval [mean - h, mean, mean + h]
+        change_negative = month_negative["change"]
+        confidence_interval = [np.nan, np.nan, np.nan]
+        if change_negative.size > 1:
+            from scipy.stats import t  # scipy is only needed by this plot: calling it without scipy raises ImportError
+            mean = change_negative.mean()
+            h = change_negative.std(ddof=1) / np.sqrt(change_negative.size) * t.ppf(0.975, change_negative.size - 1)
+            confidence_interval = [mean - h, mean, mean + h]
+        date_range = np.asarray(self.__change_list_monthly_dte_for_plot_df["date range"])
         fig.update_layout(
-            title="<b>" + str(self.__MONTH_TRADING_DAYS) + " DTE change<b>",
+            title="<b>" + str(self.__MONTH_TRADING_DAYS) + " DTE change</b>",
             title_x=0.5,
             xaxis=dict(
                 tickmode='array',
-                tickvals=list(range(1, len(self.__change_list_monthly_dte_for_plot_df["date range"]))),
-                ticktext=self.__change_list_monthly_dte_for_plot_df["date range"]
+                tickvals=np.arange(1, date_range.size),
+                ticktext=date_range
             )
         )
 
@@ -0,0 +1,153 @@
+# Copyright (c) 2024 Jacopo Ventura
+
+import contextlib
+import datetime
+import io
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import numpy as np
+import openpyxl
+import pandas as pd
+
+from helper.ES_analysis import EsPriceAnalysis
+
+PATH_GOLDEN_REPORT = os.path.join(os.path.dirname(__file__), "data", "ES_stats.html")
+
+
+def make_journal(path: str, num_days: int = 200, seed: int = 0, cells: dict | None = None):
+    """
+    Write a synthetic trading journal with the columns read by the analysis, plus a column that is not analyzed.
+    cells overwrites single cells of the journal: {(column, row): value}, None for a blank cell.
+    """
+    rng = np.random.default_rng(seed)
+    points = np.array(["PP", "S", "R"], dtype=object)
+    times = np.array([datetime.time(hour=h, minute=m) for h in range(8, 15) for m in (0, 15, 30, 45)], dtype=object)
+
+    def sometimes(probability: float, values: np.ndarray) -> np.ndarray:
+        column = np.full(num_days, np.nan, dtype=object)
+        mask = rng.random(num_days) < probability
+        column[mask] = rng.choice(values, np.count_nonzero(mask))
+        return column
+
+    journal_df = pd.DataFrame({
+        "Date": pd.date_range("2023-01-02", periods=num_days, freq="B"),
+        "Rebound 1  08:30-11": sometimes(0.4, points),
+        "Rebound 2 08:30-11": sometimes(0.15, points),
+        "No perfect rebound": sometimes(0.45, points),
+        "Trend since 8:30": rng.choice([1, -1, 0], num_days),
+        "ES & PP": rng.choice([-1, 0, 1, 2], num_days),
+        "Max Range 8:30 - 13": rng.integers(5, 80, num_days).astype(float),
+        "Body candle": rng.integers(0, 20, num_days).astype(float),
+        "Notes": ["not analyzed"] * num_days,
+    })
+    pt_deep_rebound = np.full(num_days, np.nan)
+    mask_deep_rebound = journal_df["No perfect rebound"].notna().to_numpy() & (rng.random(num_days) < 0.5)
+    pt_deep_rebound[mask_deep_rebound] = rng.integers(2, 16, np.count_nonzero(mask_deep_rebound))
+    journal_df["Pt deep rebound"] = pt_deep_rebound
+    hour_trend_change = sometimes(0.5, times)
+    journal_df["Hour trend change"] = hour_trend_change
+    new_trend = np.full(num_days, np.nan)
+    mask_reversal = pd.notna(hour_trend_change)
+    new_trend[mask_reversal] = rng.choice([1, -1, 0], np.count_nonzero(mask_reversal))
+    journal_df["New trend"] = new_trend
+    journal_df["Time cross"] = sometimes(1.0, times)
+    # like in the real journal, some days are not filled in completely
+    journal_df.loc[[17, 18], "Max Range 8:30 - 13"] = np.nan
+    for (column, row), value in (cells or {}).items():
+        journal_df.loc[row, column] = np.nan if value is None else value
+
+    # write the cells with openpyxl: the times of the day are then stored as excel times, like in the journal
+    workbook = openpyxl.Workbook()
+    worksheet = workbook.active
+    worksheet.title = "ES movement"
+    worksheet.append(list(journal_df.columns))
+    for row in journal_df.itertuples(index=False):
+        worksheet.append([None if pd.isna(value) else value.item() if isinstance(value, np.generic) else value for value in row])
+    workbook.save(path)
+
+
+class TestEsPriceAnalysisReport(unittest.TestCase):
+
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.addCleanup(self.folder.cleanup)
+        make_journal(os.path.join(self.folder.name, "trading_journal.xlsx"))
+        # keep the parsed sheet cache out of the user's cache directory
+        patcher = mock.patch.dict(os.environ, {"XDG_CACHE_HOME": os.path.join(self.folder.name, "cache")})
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def run_analysis(self) -> EsPriceAnalysis:
+        # same pandas display options as trading_journal_analysis_main.py: the report tables follow them
+        es_analysis = EsPriceAnalysis(self.folder.name + "/", "trading_journal.xlsx")
+        with pd.option_context("display.width", 400, "display.max_columns", 10, "display.float_format", "{:,.1f}".format):
+            with contextlib.redirect_stdout(io.StringIO()):
+                es_analysis.run()
+        return es_analysis
+
+    def write_report(self) -> str:
+        self.run_analysis()
+        with open(os.path.join(self.folder.name, "ES_stats.html")) as fi:
+            return fi.read()
+
+    def test_report_matches_golden_output(self):
+        with open(PATH_GOLDEN_REPORT) as fi:
+            self.assertEqual(self.write_report(), fi.read())
+
+    def test_report_has_no_rebound_type_table(self):
+        # the old rebound type table (pivot/support/resistance [%] per rebound type) is not part of the report
+        report = self.write_report()
+        self.assertIn("Probability of a rebound (4/16pt win) when approaching a Demark point:", report)
+        for column in ("pivot [%]", "support [%]", "resistance [%]"):
+            self.assertNotIn(column, report)
+
+    def test_blank_trend_and_es_pp_days_are_in_no_class(self):
+        # days not filled in yet: some of them are days without rebound, whose trend and ES & PP are counted too
+        make_journal(os.path.join(self.folder.name, "trading_journal.xlsx"),
+                     cells={("Trend since 8:30", 20): None, ("Trend since 8:30", 7): None, ("ES & PP", 27): None, ("ES & PP", 8): None})
+        es_analysis = self.run_analysis()
+        self.assertTrue(os.path.exists(os.path.join(self.folder.name, "ES_stats.html")))
+        mask_trend = (es_analysis._EsPriceAnalysis__mask_uptrend | es_analysis._EsPriceAnalysis__mask_downtrend
+                      | es_analysis._EsPriceAnalysis__mask_range)
+        mask_es_pp = es_analysis._EsPriceAnalysis__mask_es_higher_pp_start | es_analysis._EsPriceAnalysis__mask_es_lower_pp_start
+        self.assertFalse(mask_trend[[7, 20]].any())
+        self.assertEqual(np.count_nonzero(mask_trend), 198)
+        self.assertFalse(mask_es_pp[[8, 27]].any())
+        self.assertEqual(np.count_nonzero(mask_es_pp), 198)
+
+    def test_unknown_es_pp_values_are_in_neither_class(self):
+        # a mistyped ES & PP cell does not stop the report: the day is counted neither as ES<PP nor as ES>PP
+        make_journal(os.path.join(self.folder.name, "trading_journal.xlsx"), cells={("ES & PP", 15): 3, ("ES & PP", 6): -2})
+        es_analysis = self.run_analysis()
+        mask_es_higher_pp = es_analysis._EsPriceAnalysis__mask_es_higher_pp_start
+        mask_es_lower_pp = es_analysis._EsPriceAnalysis__mask_es_lower_pp_start
+        self.assertFalse(mask_es_higher_pp[[6, 15]].any() or mask_es_lower_pp[[6, 15]].any())
+        self.assertEqual(np.count_nonzero(mask_es_higher_pp | mask_es_lower_pp), 198)
+
+    def test_report_is_reproduced_from_the_cached_sheet(self):
+        report = self.write_report()
+        with mock.patch.object(pd, "read_excel", wraps=pd.read_excel) as read_excel:
+            self.assertEqual(self.write_report(), report)
+        read_excel.assert_not_called()
+
+    def test_corrupt_cache_is_read_again_from_the_journal(self):
+        report = self.write_report()
+        folder_cache = os.path.join(self.folder.name, "cache", "trading_journal_analysis")
+        (path_cache,) = [os.path.join(folder_cache, name) for name in os.listdir(folder_cache)]
+        # truncate the cache, like a run interrupted while writing it
+        with open(path_cache, "r+b") as fo:
+            fo.truncate(os.path.getsize(path_cache) // 2)
+        with mock.patch.object(pd, "read_excel", wraps=pd.read_excel) as read_excel:
+            self.assertEqual(self.write_report(), report)
+        read_excel.assert_called_once()
+        # the cache was written again: the next run uses it
+        with mock.patch.object(pd, "read_excel", wraps=pd.read_excel) as read_excel:
+            self.assertEqual(self.write_report(), report)
+        read_excel.assert_not_called()
+
+
+if __name__ == "__main__":
+    unittest.main()